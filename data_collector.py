@@ -8,8 +8,144 @@
 import subprocess
 import re
 import platform
+import ctypes
+import ctypes.util
+import errno
+import socket
+import struct
 from abc import ABC, abstractmethod
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Iterator
+
+
+_SYSTEM = platform.system().lower()
+_GW_RE = re.compile(r'gateway: ([\d.]+)')
+_MAC_CHARS = frozenset('0123456789abcdefABCDEF:')
+# netstat -ib 中每个接口的 <Link#N> 行：Name Mtu <Link#N> [MAC] Ipkts Ierrs Ibytes Opkts Oerrs Obytes
+# 无MAC地址的接口少一列，因此地址列必须含冒号，避免把Ipkts误当作地址；
+# 以换行符开头（首行总是表头）比 ^ + MULTILINE 快，后者要在每个位置尝试匹配
+_NETSTAT_IB_LINK_RE = re.compile(
+    r'\n(\S+) +\d+ +<Link#\d+> +(?:\S*:\S* +)?\d+ +\S+ +(\d+) +\d+ +\S+ +(\d+)')
+
+# sysctl net.inet.tcp.pcblist_n 的记录格式（见 xnu bsd/netinet/in_pcb.h、tcp_var.h）
+_XSO_SOCKET = 0x001
+_XSO_RCVBUF = 0x002
+_XSO_SNDBUF = 0x004
+_XSO_STATS = 0x008
+_XSO_INPCB = 0x010
+_XSO_TCPCB = 0x020
+_ALL_XGN_KIND_TCP = (_XSO_SOCKET | _XSO_RCVBUF | _XSO_SNDBUF |
+                     _XSO_STATS | _XSO_INPCB | _XSO_TCPCB)
+_XINPGEN_SIZE = 24           # sizeof(struct xinpgen)
+_TCPS_ESTABLISHED = 4
+_INP_IPV4 = 0x1
+
+_XGEN_N = struct.Struct('=II')       # xgn_len, xgn_kind
+_INP_PORTS = struct.Struct('!HH')    # inp_fport, inp_lport（网络字节序）
+_TCP_STATE = struct.Struct('=i')     # xtcpcb_n.t_state
+_INP_FPORT_OFFSET = 16
+_INP_VFLAG_OFFSET = 48
+_INP_FADDR4_OFFSET = 64              # inp_dependfaddr.inp46_foreign.ia46_addr4
+_INP_LADDR4_OFFSET = 80              # inp_dependladdr.inp46_local.ia46_addr4
+_TCP_STATE_OFFSET = 36
+
+_libc = None
+
+
+def _iter_command_lines(args: List[str]) -> Iterator[str]:
+    """逐行读取命令输出，避免一次性缓冲整个stdout"""
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as proc:
+        yield from proc.stdout
+
+
+def _split_ipport(addr: str) -> Optional[Tuple[str, str]]:
+    """拆分 netstat 的 IP.PORT 地址，IP部分必须是含3个点的IPv4地址"""
+    dot = addr.rfind('.')
+    if dot < 0 or addr.count('.', 0, dot) != 3:
+        return None
+    return addr[:dot], addr[dot + 1:]
+
+
+def _parse_netstat_ib(output: str) -> Dict[str, Dict[str, int]]:
+    """从 netstat -ib 输出的 <Link#N> 行提取各接口收发字节数，排除回环接口"""
+    return {
+        match.group(1): {'bytes_in': int(match.group(2)), 'bytes_out': int(match.group(3))}
+        for match in _NETSTAT_IB_LINK_RE.finditer(output)
+        if match.group(1) != 'lo0'
+    }
+
+
+def _roundup64(length: int) -> int:
+    """按8字节对齐记录长度（与内核 ROUNDUP64 一致）"""
+    return ((length - 1) | 7) + 1 if length > 0 else 8
+
+
+def _sysctlbyname(name: bytes) -> Optional[bytes]:
+    """通过 sysctlbyname 直接读取内核数据，失败时返回 None"""
+    global _libc
+    if _libc is None:
+        libc_path = ctypes.util.find_library('c')
+        if not libc_path:
+            return None
+        _libc = ctypes.CDLL(libc_path, use_errno=True)
+
+    size = ctypes.c_size_t(0)
+    for _ in range(3):
+        if _libc.sysctlbyname(name, None, ctypes.byref(size), None, ctypes.c_size_t(0)) != 0:
+            return None
+        # 连接表在两次调用之间可能增长，预留一些余量
+        size.value += size.value // 8 + 4096
+        buf = ctypes.create_string_buffer(size.value)
+        if _libc.sysctlbyname(name, buf, ctypes.byref(size), None, ctypes.c_size_t(0)) == 0:
+            return buf.raw[:size.value]
+        if ctypes.get_errno() != errno.ENOMEM:
+            return None
+    return None
+
+
+def _parse_tcp_pcblist_n(buf: bytes) -> List[Dict]:
+    """解析 net.inet.tcp.pcblist_n 返回的二进制记录，提取已建立的IPv4连接"""
+    connections = []
+    if len(buf) < _XINPGEN_SIZE:
+        return connections
+
+    end = len(buf)
+    offset = _roundup64(_XGEN_N.unpack_from(buf, 0)[0])
+    which = 0
+    inp_offset = tcp_offset = 0
+
+    # 每个连接由 socket/rcvbuf/sndbuf/stats/inpcb/tcpcb 六段记录组成，末尾是 xinpgen
+    while offset + _XGEN_N.size <= end:
+        xgn_len, xgn_kind = _XGEN_N.unpack_from(buf, offset)
+        if xgn_len <= _XINPGEN_SIZE or offset + xgn_len > end:
+            break
+        if not which & xgn_kind:
+            which |= xgn_kind
+            if xgn_kind == _XSO_INPCB:
+                inp_offset = offset
+            elif xgn_kind == _XSO_TCPCB:
+                tcp_offset = offset
+        offset += _roundup64(xgn_len)
+
+        if which != _ALL_XGN_KIND_TCP:
+            continue
+        which = 0
+
+        if _TCP_STATE.unpack_from(buf, tcp_offset + _TCP_STATE_OFFSET)[0] != _TCPS_ESTABLISHED:
+            continue
+        if not buf[inp_offset + _INP_VFLAG_OFFSET] & _INP_IPV4:
+            continue
+
+        foreign_port, local_port = _INP_PORTS.unpack_from(buf, inp_offset + _INP_FPORT_OFFSET)
+        foreign_ip = socket.inet_ntoa(buf[inp_offset + _INP_FADDR4_OFFSET:inp_offset + _INP_FADDR4_OFFSET + 4])
+        local_ip = socket.inet_ntoa(buf[inp_offset + _INP_LADDR4_OFFSET:inp_offset + _INP_LADDR4_OFFSET + 4])
+        connections.append({
+            'local_ip': local_ip,
+            'local_port': str(local_port),
+            'foreign_ip': foreign_ip,
+            'foreign_port': str(foreign_port),
+            'protocol': 'tcp'
+        })
+    return connections
 
 
 class BaseDataCollector(ABC):
@@ -43,82 +179,83 @@ class DarwinDataCollector(BaseDataCollector):
         """获取ARP表，返回 {ip: mac}"""
         devices = {}
         try:
-            result = subprocess.run(['arp', '-a'], capture_output=True, text=True)
-            for line in result.stdout.split('\n'):
-                if line.strip():
-                    # 解析 (192.168.31.1) at aa:bb:cc:dd:ee:ff on en0 ifscope [ethernet]
-                    match = re.search(r'\(([^)]+)\) at ([a-fA-F0-9:]{17})', line)
-                    if match:
-                        ip, mac = match.groups()
-                        devices[ip] = mac
+            for line in _iter_command_lines(['arp', '-a']):
+                # 解析 (192.168.31.1) at aa:bb:cc:dd:ee:ff on en0 ifscope [ethernet]
+                lp = line.find('(')
+                if lp < 0:
+                    continue
+                rp = line.find(')', lp + 1)
+                if rp < 0:
+                    continue
+                at = line.find(' at ', rp)
+                if at < 0:
+                    continue
+                mac = line[at + 4:at + 21]
+                if len(mac) == 17 and mac[2] == ':' and _MAC_CHARS.issuperset(mac):
+                    devices[line[lp + 1:rp]] = mac
         except (subprocess.SubprocessError, OSError, ValueError) as e:
             print(f"获取ARP表失败: {e}")
         return devices
     
     def get_connections(self) -> List[Dict]:
-        """获取网络连接列表"""
+        """获取网络连接列表 - 优先直接读取内核连接表"""
+        try:
+            buf = _sysctlbyname(b'net.inet.tcp.pcblist_n')
+            if buf is not None:
+                return _parse_tcp_pcblist_n(buf)
+        except (OSError, AttributeError, struct.error, IndexError) as e:
+            print(f"读取内核连接表失败，回退到netstat: {e}")
+        return self._get_connections_netstat()
+    
+    def _get_connections_netstat(self) -> List[Dict]:
+        """通过 netstat 获取网络连接列表（后备方案）"""
         connections = []
         try:
-            result = subprocess.run(['netstat', '-n'], capture_output=True, text=True)
-            for line in result.stdout.split('\n'):
+            for line in _iter_command_lines(['netstat', '-n']):
                 if 'ESTABLISHED' in line and ('tcp4' in line or 'tcp6' in line):
                     parts = line.split()
-                    if len(parts) >= 4:
-                        local_addr = parts[3]
-                        foreign_addr = parts[4]
-                        
+                    if len(parts) >= 5:
                         # 解析地址和端口 - 处理 IP.PORT 格式
                         # 例如: 28.0.0.1.62657 或 192.168.31.31.58581
-                        local_parts = local_addr.rsplit('.', 1)
-                        foreign_parts = foreign_addr.rsplit('.', 1)
+                        local = _split_ipport(parts[3])
+                        foreign = _split_ipport(parts[4])
                         
-                        if len(local_parts) == 2 and len(foreign_parts) == 2:
-                            local_ip = local_parts[0]
-                            local_port = local_parts[1]
-                            foreign_ip = foreign_parts[0]
-                            foreign_port = foreign_parts[1]
-                            
-                            # 验证IP格式（应该有3个点）
-                            if local_ip.count('.') == 3 and foreign_ip.count('.') == 3:
-                                connections.append({
-                                    'local_ip': local_ip,
-                                    'local_port': local_port,
-                                    'foreign_ip': foreign_ip,
-                                    'foreign_port': foreign_port,
-                                    'protocol': 'tcp'
-                                })
+                        if local and foreign:
+                            connections.append({
+                                'local_ip': local[0],
+                                'local_port': local[1],
+                                'foreign_ip': foreign[0],
+                                'foreign_port': foreign[1],
+                                'protocol': 'tcp'
+                            })
         except (subprocess.SubprocessError, OSError, ValueError) as e:
             print(f"获取网络连接失败: {e}")
         return connections
     
     def get_interface_stats(self) -> Dict:
-        """获取网络接口统计"""
-        stats = {}
+        """获取网络接口统计 - 对 netstat -ib 的完整输出做一次预编译正则匹配"""
         try:
             result = subprocess.run(['netstat', '-ib'], capture_output=True, text=True)
-            for line in result.stdout.split('\n')[1:]:  # 跳过表头
-                parts = line.split()
-                if len(parts) >= 10:
-                    interface = parts[0]
-                    if interface and interface != 'lo0':  # 排除回环接口
-                        try:
-                            bytes_in = int(parts[6])
-                            bytes_out = int(parts[9])
-                            stats[interface] = {
-                                'bytes_in': bytes_in,
-                                'bytes_out': bytes_out
-                            }
-                        except (ValueError, IndexError):
-                            continue
         except (subprocess.SubprocessError, OSError) as e:
             print(f"获取接口统计失败: {e}")
-        return stats
+            return {}
+        return _parse_netstat_ib(result.stdout)
     
     def detect_local_network(self) -> str:
-        """检测本地网络段"""
+        """检测本地网络段 - 优先取默认路由的出口地址，无需启动子进程"""
+        try:
+            # UDP connect 只查询路由表选择出口地址，不会发出任何数据包
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.connect(('8.8.8.8', 53))
+                local_ip = sock.getsockname()[0]
+            if local_ip != '0.0.0.0':
+                return '.'.join(local_ip.split('.')[:-1]) + '.0/24'
+        except OSError as e:
+            print(f"通过默认路由检测本地网络失败，回退到route: {e}")
+        
         try:
             result = subprocess.run(['route', '-n', 'get', 'default'], capture_output=True, text=True)
-            gateway_match = re.search(r'gateway: ([\d.]+)', result.stdout)
+            gateway_match = _GW_RE.search(result.stdout)
             if gateway_match:
                 gateway = gateway_match.group(1)
                 return '.'.join(gateway.split('.')[:-1]) + '.0/24'
@@ -162,7 +299,7 @@ class WindowsDataCollector(BaseDataCollector):
 
 def create_data_collector() -> BaseDataCollector:
     """根据当前平台创建对应的数据收集器"""
-    system = platform.system().lower()
+    system = _SYSTEM
     
     if system == 'darwin':
         return DarwinDataCollector()
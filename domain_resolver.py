@@ -10,31 +10,31 @@ import ipaddress
 import json
 import os
 import time
-from typing import Dict, Optional, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 import threading
 import urllib.request
 import struct
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from utils import shutdown_executor
 
 class EnhancedDomainResolver:
     def __init__(self):
-        self.dns_cache = {}  # {ip: (domain, timestamp)}
+        # {ip: (domain, expire_at)}，TTL固定，插入顺序即过期顺序
+        self.dns_cache = OrderedDict()
         self.ip_to_site_cache = {}  # {ip: site_name}
         self.cache_ttl = 3600  # 1小时缓存
+        self.cache_max_entries = 65536
         self.lock = threading.Lock()
+        # 反向查询线程池，避免修改进程全局的socket超时
+        self._dns_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='dns-resolver')
+        # 超时未完成的反向查询 {ip: Future}，下次解析同一IP时复用而不是重新提交，也不再等待
+        self._inflight_lookups = {}
+        # close() 之后不再提交反向查询，直接返回兜底名称
+        self._closed = False
         
         # 不再使用硬编码IP范围，完全依赖GeoSite数据
     
-    def _ip_in_range(self, ip: str, cidr_ranges: list) -> bool:
-        """检查IP是否在指定CIDR范围内"""
-        try:
-            ip_obj = ipaddress.ip_address(ip)
-            for cidr in cidr_ranges:
-                if ip_obj in ipaddress.ip_network(cidr, strict=False):
-                    return True
-        except (ipaddress.AddressValueError, ValueError):
-            pass
-        return False
-    
     def _resolve_by_ip_range(self, ip: str) -> Optional[str]:
         """通过GeoSite IP数据推断网站名称"""
         try:
@@ -49,90 +49,158 @@ class EnhancedDomainResolver:
         except ImportError:
             return None
     
-    def _dns_resolve_with_timeout(self, ip: str, timeout: float = 0.5) -> Optional[str]:
-        """带超时的DNS反向查询"""
-        old_timeout = socket.getdefaulttimeout()
+    def _submit_reverse_lookup(self, ip: str) -> Tuple[Optional[Future], bool]:
+        """提交DNS反向查询，同一IP已有进行中的查询时直接复用，返回 (future, 是否新提交)
+        
+        解析器已关闭时返回 (None, False)
+        """
+        with self.lock:
+            future = self._inflight_lookups.get(ip)
+            if future is not None or self._closed:
+                return future, False
+            future = self._dns_pool.submit(socket.gethostbyaddr, ip)
+            self._inflight_lookups[ip] = future
+            return future, True
+    
+    def _take_reverse_lookup_result(self, future: Future) -> Optional[str]:
+        """读取已完成的DNS反向查询得到的完整主机名，查询失败返回None"""
         try:
-            # 设置socket超时
-            socket.setdefaulttimeout(timeout)
-            
-            result = socket.gethostbyaddr(ip)[0]
-            
-            if result != ip and '.' in result:
-                # 简化域名显示
-                parts = result.split('.')
-                if len(parts) >= 2:
-                    return '.'.join(parts[-2:])
-            return result
-            
-        except (socket.herror, socket.gaierror, socket.timeout, OSError, Exception):
+            return future.result(timeout=0)[0]
+        except (socket.herror, socket.gaierror, socket.timeout, OSError):
             return None
-        finally:
-            # 确保总是恢复原始超时设置
-            socket.setdefaulttimeout(old_timeout)
     
-    def resolve_domain(self, ip: str) -> str:
-        """增强的域名解析方法 - 集成GeoSite数据"""
-        if not ip or ip == '0.0.0.0':
-            return ip
-            
-        current_time = time.time()
+    def _needs_reverse_lookup(self, ip: str) -> bool:
+        """私有、回环、链路本地地址不是远端网站，跳过DNS查询
         
+        这类地址的PTR名称只对局域网有意义（设备名由 NetworkMonitor._resolve_hostname 单独解析），
+        不适合作为网站名称显示
+        """
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return not (addr.is_private or addr.is_loopback or addr.is_link_local)
+    
+    def _cache_get(self, ip: str) -> Optional[str]:
+        """读取未过期的缓存项"""
+        with self.lock:
+            cached = self.dns_cache.get(ip)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+        return None
+    
+    def _cache_put(self, ip: str, domain: str) -> str:
+        """写入缓存，超过容量时淘汰最早过期的条目"""
         with self.lock:
-            # 检查缓存
-            if ip in self.dns_cache:
-                cached_domain, timestamp = self.dns_cache[ip]
-                if current_time - timestamp < self.cache_ttl:
-                    return cached_domain
+            self.dns_cache.pop(ip, None)
+            self.dns_cache[ip] = (domain, time.monotonic() + self.cache_ttl)
+            while len(self.dns_cache) > self.cache_max_entries:
+                self.dns_cache.popitem(last=False)
+        return domain
+    
+    def _resolve_by_cache_or_ip_range(self, ip: str) -> Optional[str]:
+        """依次查缓存和IP范围，都未命中返回None"""
+        if not ip or ip == '0.0.0.0':
+            return ip
         
-        # 解析策略（按优先级）
-        domain = None
+        # 检查缓存
+        cached_domain = self._cache_get(ip)
+        if cached_domain is not None:
+            return cached_domain
         
-        # 1. 先尝试IP范围匹配（最快）
+        # 先尝试IP范围匹配（最快），命中时无需DNS查询
         domain = self._resolve_by_ip_range(ip)
         if domain:
+            return self._cache_put(ip, domain)
+        return None
+    
+    def _finish_resolution(self, ip: str, future: Optional[Future]) -> str:
+        """根据反向查询结果确定显示名称，future为None表示无需DNS查询"""
+        hostname = None
+        if future is not None:
+            if not future.done():
+                # 超时：查询留在进行中列表，完成前直接返回兜底名称；兜底名称不写缓存，避免掩盖真实域名
+                return f"{ip}(未知网站)"
             with self.lock:
-                self.dns_cache[ip] = (domain, current_time)
-            return domain
+                if self._inflight_lookups.get(ip) is future:
+                    del self._inflight_lookups[ip]
+            hostname = self._take_reverse_lookup_result(future)
         
-        # 2. 快速DNS反向查询（超时0.5秒）
-        domain = self._dns_resolve_with_timeout(ip, timeout=0.5)
-        if domain and domain != ip:
-            # 2.1 尝试通过GeoSite数据进一步识别网站
+        if hostname and hostname != ip:
             try:
                 from geosite_loader import geosite_loader
-                category = geosite_loader.get_domain_category(domain)
-                if category:
-                    # 使用分类名作为显示名称
-                    display_name = f"{category}.com" if not domain.endswith('.com') else domain
-                    with self.lock:
-                        self.dns_cache[ip] = (display_name, current_time)
-                    return display_name
+                from unified_service_identifier import unified_service_identifier
             except ImportError:
-                pass
+                return self._cache_put(ip, hostname)
             
-            with self.lock:
-                self.dns_cache[ip] = (domain, current_time)
-            return domain
+            # 主机名含已知服务关键词（如 *.cloudfront.net）时，与IP范围命中一样显示服务名
+            service = unified_service_identifier.identify_service_by_hostname(hostname)
+            if service:
+                return self._cache_put(ip, f"{service.name.lower()}.com")
+            
+            # 简化域名显示
+            domain = hostname
+            if '.' in domain:
+                domain = '.'.join(domain.split('.')[-2:])
+            
+            # 尝试通过GeoSite数据进一步识别网站
+            category = geosite_loader.get_domain_category(domain)
+            if category:
+                # 使用分类名作为显示名称
+                display_name = f"{category}.com" if not domain.endswith('.com') else domain
+                return self._cache_put(ip, display_name)
+            
+            return self._cache_put(ip, domain)
         
-        # 3. 兜底：返回IP地址
-        fallback_domain = f"{ip}(未知网站)"
-        with self.lock:
-            self.dns_cache[ip] = (fallback_domain, current_time)
+        # 兜底：返回IP地址
+        return self._cache_put(ip, f"{ip}(未知网站)")
+    
+    def resolve_domain(self, ip: str) -> str:
+        """增强的域名解析方法 - 集成GeoSite数据"""
+        return self.resolve_many([ip])[ip]
+    
+    def resolve_many(self, ips: List[str]) -> Dict[str, str]:
+        """批量解析域名 - 先查缓存和IP范围，仅对未命中的公网IP并发反向查询，所有查询共用一个超时"""
+        results = {}
+        pending = []
+        for ip in dict.fromkeys(ips):
+            domain = self._resolve_by_cache_or_ip_range(ip)
+            if domain is not None:
+                results[ip] = domain
+            else:
+                pending.append(ip)
         
-        return fallback_domain
+        # 快速DNS反向查询（新提交的查询共用0.5秒超时），非公网地址不是网站，直接兜底
+        # 之前已超时的查询不再等待，避免慢速IP在每轮解析中反复占用超时时间
+        futures = {}
+        new_futures = []
+        for ip in pending:
+            if self._needs_reverse_lookup(ip):
+                futures[ip], is_new = self._submit_reverse_lookup(ip)
+                if is_new:
+                    new_futures.append(futures[ip])
+        if new_futures:
+            wait(new_futures, timeout=0.5)
+        for ip in pending:
+            results[ip] = self._finish_resolution(ip, futures.get(ip))
+        return results
     
     def clear_cache(self):
-        """清理过期缓存"""
-        current_time = time.time()
+        """清理过期缓存 - 只检查队首已过期的条目"""
+        current_time = time.monotonic()
         with self.lock:
-            expired_ips = [
-                ip for ip, (_, timestamp) in self.dns_cache.items()
-                if current_time - timestamp > self.cache_ttl
-            ]
-            for ip in expired_ips:
+            while self.dns_cache:
+                ip, (_, expire_at) = next(iter(self.dns_cache.items()))
+                if expire_at > current_time:
+                    break
                 del self.dns_cache[ip]
     
+    def close(self):
+        """关闭反向查询线程池，丢弃尚未开始的查询；之后的解析只查缓存和IP范围"""
+        with self.lock:
+            self._closed = True
+        shutdown_executor(self._dns_pool)
+    
     def get_cache_stats(self) -> Dict:
         """获取缓存统计信息"""
         with self.lock:
@@ -6,27 +6,159 @@ V2Ray GeoSite 数据加载器
 """
 
 import os
+import re
 import urllib.request
+import urllib.error
 import json
+import shutil
 import time
 import struct
 import ipaddress
+import heapq
+import pickle
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
 from typing import Dict, List, Optional, Set, Tuple
 import threading
-from v2ray_dat_parser import V2RayDatParser
-from utils import is_china_ip
+from v2ray_dat_parser import V2RayDatParser, GeositeEntry
+from utils import is_china_ip, ipv4_to_int
 from unified_service_identifier import unified_service_identifier
 
+# GeoIP数据中的特殊服务分类，按匹配优先级排列
+SPECIAL_IP_SERVICES = ['CLOUDFLARE', 'GOOGLE', 'TELEGRAM', 'FACEBOOK', 'NETFLIX', 'TWITTER', 'FASTLY', 'CLOUDFRONT']
+_SPECIAL_IP_SERVICE_SET = frozenset(SPECIAL_IP_SERVICES)
+# 区间表中特殊服务使用的小写标签
+_SPECIAL_IP_SERVICE_LABELS = frozenset(service.lower() for service in SPECIAL_IP_SERVICES)
+
+# 解析结果磁盘缓存的格式版本，缓存结构变化时递增
+_PARSED_CACHE_VERSION = 7
+# 需要写入磁盘缓存的查找结构
+_LOOKUP_CACHE_ATTRS = ('_ip_country_table', '_suffix_trie',
+                       '_pattern_rules', '_pattern_filter', '_categories', '_total_rules')
+
+# 域名后缀树节点中的标记键（'@'在规则解析时已被当作属性分隔符剥离，不会出现在标签中）
+_SUFFIX_MARK = '@domain'
+_FULL_MARK = '@full'
+
+# 多个服务分类同时匹配时的优先顺序（越靠前越优先）
+_PRIORITY_SERVICE_RANK = {name: rank for rank, name in enumerate([
+    'YOUTUBE', 'TIKTOK', 'BYTEDANCE', 'GOOGLE', 'FACEBOOK', 'TWITTER',
+    'TELEGRAM', 'APPLE', 'MICROSOFT', 'AMAZON', 'NETFLIX', 'SPOTIFY',
+    'ALIBABA', 'TENCENT', 'BAIDU', 'BILIBILI'])}
+
+# 查询结果缓存的容量（每种查询）
+_QUERY_CACHE_SIZE = 65536
+
+# 正则中的反向引用（\1 或 (?P=name)）
+_BACKREFERENCE_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def _cidrs_to_ranges(cidrs: List[str]) -> Tuple[array, array]:
+    """将CIDR字符串列表转换为IPv4 (起始地址, 结束地址) 整数列"""
+    starts, ends = array('Q'), array('Q')
+    for cidr in cidrs:
+        try:
+            net = ipaddress.ip_network(cidr, strict=False)
+        except ValueError:
+            continue
+        if net.version == 4:
+            starts.append(int(net.network_address))
+            ends.append(int(net.broadcast_address))
+    return starts, ends
+
+
+def _build_interval_table(labeled_ranges: List[Tuple[str, Tuple[array, array]]]) -> Tuple[array, array, List[str]]:
+    """将按优先级排列的 (标签, IPv4区间列) 展平为互不重叠、按起始地址排序的IPv4区间表
+    
+    区间重叠时取优先级最高（列表中靠前）的标签，与逐个CIDR线性匹配的结果一致
+    """
+    ranges = []
+    for priority, (label, (range_starts, range_ends)) in enumerate(labeled_ranges):
+        for start, end in zip(range_starts, range_ends):
+            ranges.append((start, end, priority, label))
+    ranges.sort()
+    
+    starts, ends, labels = array('Q'), array('Q'), []
+    points = sorted({r[0] for r in ranges} | {r[1] + 1 for r in ranges})
+    active = []  # 小顶堆: (priority, end, label)
+    i = 0
+    for j in range(len(points) - 1):
+        point = points[j]
+        while i < len(ranges) and ranges[i][0] <= point:
+            _, end, priority, label = ranges[i]
+            heapq.heappush(active, (priority, end, label))
+            i += 1
+        while active and active[0][1] < point:
+            heapq.heappop(active)
+        if not active:
+            continue
+        
+        label = active[0][2]
+        segment_end = points[j + 1] - 1
+        if labels and labels[-1] == label and ends[-1] + 1 == point:
+            ends[-1] = segment_end  # 合并相邻的同标签区间
+        else:
+            starts.append(point)
+            ends.append(segment_end)
+            labels.append(label)
+    
+    return starts, ends, labels
+
+
+def _compile_pattern_filter(pattern_rules: List[Tuple[int, str, object]]) -> Optional[re.Pattern]:
+    """将全部keyword/regexp规则合并为一个正则，一次扫描即可判断是否需要逐条匹配"""
+    parts = []
+    for _, rule_type, pattern in pattern_rules:
+        if rule_type == 'keyword':
+            parts.append(re.escape(pattern))
+        elif _BACKREFERENCE_RE.search(pattern.pattern):
+            # 反向引用在合并正则中会指向其他规则的分组，预筛选可能漏掉匹配，退化为逐条匹配
+            return re.compile('')
+        else:
+            parts.append(f'(?:{pattern.pattern})')
+    
+    if not parts:
+        return None
+    try:
+        return re.compile('|'.join(parts))
+    except re.error:
+        # 个别正则无法合并（如中间出现全局标志）时，退化为每次都逐条匹配
+        return re.compile('')
+
+
+def _lookup_interval(table: Tuple[array, array, List[str]], value: int) -> Optional[str]:
+    """在区间表中二分查找包含value的区间标签"""
+    starts, ends, labels = table
+    i = bisect_right(starts, value) - 1
+    if i >= 0 and value <= ends[i]:
+        return labels[i]
+    return None
+
+
 class GeositeLoader:
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
-        self.geosite_data = {}  # {category: [domains]}
-        self.geoip_data = {}    # {country: [cidr_ranges]}
-        self.domain_to_category = {}  # 快速查找缓存
+        self.geosite_data = {}  # {category: rule_count}，规则本身只保存在查找结构中
+        self.geoip_data = {}    # {country: (starts, ends)}，IPv4区间的整数列
+        # 按反转标签组织的域名后缀树，节点标记中保存分类序号
+        self._suffix_trie = {}
+        self._pattern_rules = []  # [(分类序号, 规则类型, 关键词或预编译正则)]，keyword/regexp规则
+        self._pattern_filter = None  # 合并后的keyword/regexp预筛选正则
+        self._categories = []     # 分类序号 -> 分类名（保持geosite_data顺序）
+        self._total_rules = 0
         self.ip_ranges = {}     # IP范围缓存
+        # IPv4区间表 (starts, ends, labels)，由 _build_lookup_cache 构建
+        self._ip_country_table = (array('Q'), array('Q'), [])
         self.lock = threading.Lock()
         self.last_update = 0
         self.update_interval = 24 * 3600  # 24小时更新一次
+        # 查询结果缓存，查找结构重建时清空
+        self._domain_category_cache = lru_cache(maxsize=_QUERY_CACHE_SIZE)(self._lookup_domain_category)
+        self._ip_info_cache = lru_cache(maxsize=_QUERY_CACHE_SIZE)(self._lookup_ip_info)
+        self.cache_path = os.path.join(data_dir, 'geosite.cache.pkl')
+        # 已下载文件的 ETag / Last-Modified，用于条件请求
+        self.download_meta_path = os.path.join(data_dir, 'download_meta.json')
         
         # 确保数据目录存在
         os.makedirs(data_dir, exist_ok=True)
@@ -59,21 +191,65 @@ class GeositeLoader:
             # 如果无法获取最新版本，返回None让调用方处理
             return None, None
     
+    def _load_download_meta(self) -> Dict[str, Dict[str, str]]:
+        """读取已下载文件的校验信息"""
+        try:
+            with open(self.download_meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_download_meta(self, meta: Dict[str, Dict[str, str]]):
+        """保存已下载文件的校验信息"""
+        try:
+            with open(self.download_meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        except OSError as e:
+            print(f"保存下载信息失败: {e}")
+    
     def _download_file(self, url: str, filename: str) -> bool:
-        """下载数据文件"""
+        """下载数据文件 - 条件请求，文件未变化时服务器返回304，内容分块写入磁盘"""
         filepath = os.path.join(self.data_dir, filename)
+        meta = self._load_download_meta()
+        validators = meta.get(filename, {}) if os.path.exists(filepath) else {}
+        
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        tmp_path = filepath + '.tmp'
         try:
             print(f"下载 {filename}...")
-            with urllib.request.urlopen(url, timeout=30) as response:
-                with open(filepath, 'wb') as f:
-                    f.write(response.read())
+            request = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(request, timeout=30) as response:
+                with open(tmp_path, 'wb') as f:
+                    shutil.copyfileobj(response, f, 1 << 20)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+            os.replace(tmp_path, filepath)
+            
+            meta[filename] = {'etag': etag, 'last_modified': last_modified}
+            self._save_download_meta(meta)
             print(f"{filename} 下载完成")
             return True
+        except urllib.error.HTTPError as e:
+            # HTTPError 同时也是响应对象，需要关闭以释放连接
+            with e:
+                if e.code == 304:
+                    print(f"{filename} 未变化，跳过下载")
+                    return True
+                print(f"下载 {filename} 失败: {e}")
+                return False
         except Exception as e:
             print(f"下载 {filename} 失败: {e}")
             return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
     
-    def _parse_geosite_dat(self, filepath: str) -> Dict[str, List[str]]:
+    def _parse_geosite_dat(self, filepath: str) -> Dict[str, GeositeEntry]:
         """解析 geosite.dat 文件 - 使用完整解析器"""
         try:
             # 使用新的完整V2Ray DAT解析器
@@ -86,22 +262,20 @@ class GeositeLoader:
         except Exception as e:
             print(f"解析 geosite.dat 失败: {e}")
             # 返回后备数据
-            fallback_entries = self.parser._get_fallback_geosite_data()
-            return {category: entry.domains for category, entry in fallback_entries.items()}
+            return self.parser._get_fallback_geosite_data()
     
-    def _parse_geoip_dat(self, filepath: str) -> Dict[str, List[str]]:
+    def _parse_geoip_dat(self, filepath: str) -> Dict[str, Tuple[array, array]]:
         """解析 geoip.dat 文件 - 使用完整解析器"""
         try:
             # 使用新的完整V2Ray DAT解析器
             geoip_entries = self.parser.parse_geoip_dat(filepath)
             
-            # 转换为原有格式 (国家代码 -> CIDR列表)
+            # 转换为 国家代码 -> (起始地址列, 结束地址列)，不再保留CIDR字符串
             geoip_data = {}
             for country_code, entry in geoip_entries.items():
-                cidr_list = []
+                starts, ends = array('Q'), array('Q')
                 for ip, prefix in entry.ip_ranges:
                     # 过滤明显错误的IP段
-                    import ipaddress
                     try:
                         # 检查IP是否是私有地址
                         ip_obj = ipaddress.ip_address(ip)
@@ -120,9 +294,15 @@ class GeositeLoader:
                             
                     except Exception:
                         pass  # 忽略IP解析错误，继续处理
-                        
-                    cidr_list.append(f"{ip}/{prefix}")
-                geoip_data[country_code] = cidr_list
+                    
+                    # 查找表只覆盖IPv4
+                    ip_value = ipv4_to_int(ip)
+                    if ip_value < 0 or not 0 <= prefix <= 32:
+                        continue
+                    host_mask = (1 << (32 - prefix)) - 1
+                    starts.append(ip_value & ~host_mask)
+                    ends.append(ip_value | host_mask)
+                geoip_data[country_code] = (starts, ends)
             
             print(f"✅ 成功加载 {len(geoip_data)} 个国家/地区的IP段")
             return geoip_data
@@ -131,21 +311,59 @@ class GeositeLoader:
             print(f"解析 geoip.dat 失败: {e}")
             # 返回基础IP范围数据
             return {
-                'cn': ['110.0.0.0/7', '112.0.0.0/5', '120.0.0.0/6'],
-                'us': ['8.8.8.0/24', '172.217.0.0/16'],
-                'telegram': ['149.154.160.0/20', '91.108.56.0/21']
+                'cn': _cidrs_to_ranges(['110.0.0.0/7', '112.0.0.0/5', '120.0.0.0/6']),
+                'us': _cidrs_to_ranges(['8.8.8.0/24', '172.217.0.0/16']),
+                'telegram': _cidrs_to_ranges(['149.154.160.0/20', '91.108.56.0/21'])
             }
     
-    def _build_lookup_cache(self):
-        """构建快速查找缓存 - 新规则系统不需要预建索引"""
+    def _build_lookup_cache(self, geosite_entries: Dict[str, GeositeEntry]):
+        """构建快速查找缓存 - GeoIP区间表和域名后缀树"""
+        # 数据文件中为大写键，后备数据为小写键，统一按大写归类
+        geoip_by_name = {name.upper(): ranges for name, ranges in self.geoip_data.items()}
+        special_services = [(service.lower(), geoip_by_name[service])
+                            for service in SPECIAL_IP_SERVICES if service in geoip_by_name]
+        countries = [(name.lower(), ranges) for name, ranges in geoip_by_name.items()
+                     if name not in _SPECIAL_IP_SERVICE_SET]
+        country_table = _build_interval_table(special_services + countries)
+        
+        categories = list(geosite_entries)
+        suffix_trie = {}
+        pattern_rules = []
+        total_rules = 0
+        for index, category in enumerate(categories):
+            for domain_rule in geosite_entries[category].domains:
+                total_rules += 1
+                if domain_rule.rule_type == 'keyword':
+                    pattern_rules.append((index, 'keyword', domain_rule.value))
+                    continue
+                if domain_rule.rule_type == 'regexp':
+                    try:
+                        pattern_rules.append((index, 'regexp', re.compile(domain_rule.value)))
+                    except re.error:
+                        pass  # 非法正则永远不会匹配
+                    continue
+                
+                # domain/full 规则（以及未知类型，按后缀匹配）插入后缀树
+                node = suffix_trie
+                for label in reversed(domain_rule.value.split('.')):
+                    node = node.setdefault(label, {})
+                mark = _FULL_MARK if domain_rule.rule_type == 'full' else _SUFFIX_MARK
+                node.setdefault(mark, []).append(index)
+        
+        pattern_filter = _compile_pattern_filter(pattern_rules)
+        
         with self.lock:
-            # 计算统计信息
-            total_rules = 0
-            for category, entry in self.geosite_data.items():
-                total_rules += len(entry.domains)
+            self._ip_country_table = country_table
+            self._suffix_trie = suffix_trie
+            self._pattern_rules = pattern_rules
+            self._pattern_filter = pattern_filter
+            self._categories = categories
+            self._total_rules = total_rules
+            self.geosite_data = {category: geosite_entries[category].domain_count for category in categories}
+            self._clear_query_caches()
             
             print(f"加载了 {total_rules} 个域名规则")
-            print(f"支持 {len(self.geosite_data)} 个网站分类")
+            print(f"支持 {len(categories)} 个网站分类")
     
     def _should_update(self) -> bool:
         """检查是否需要更新数据文件"""
@@ -187,30 +405,98 @@ class GeositeLoader:
                 
                 self.last_update = time.time()
             
+            # 数据文件未变化时直接使用上次解析的结果
+            signature = self._source_signature()
+            if self._load_parsed_cache(signature):
+                return
+            
             # 解析数据文件
             geosite_path = os.path.join(self.data_dir, 'geosite.dat')
             geoip_path = os.path.join(self.data_dir, 'geoip.dat')
             
+            geosite_entries = {}
             if os.path.exists(geosite_path):
-                self.geosite_data = self._parse_geosite_dat(geosite_path)
+                geosite_entries = self._parse_geosite_dat(geosite_path)
             
             if os.path.exists(geoip_path):
                 self.geoip_data = self._parse_geoip_dat(geoip_path)
             
-            # 构建查找缓存
-            self._build_lookup_cache()
+            # 构建查找缓存，之后不再需要逐条的规则对象
+            self._build_lookup_cache(geosite_entries)
+            self.parser.clear_cache()
+            self._save_parsed_cache(signature)
             
         except Exception as e:
             print(f"加载数据文件失败: {e}")
             # 使用预置的最小数据集
             self._load_fallback_data()
     
+    def _source_signature(self) -> Tuple:
+        """数据文件的 (文件名, 修改时间, 大小) 签名，用于判断磁盘缓存是否仍然有效"""
+        signature = []
+        for filename in ('geosite.dat', 'geoip.dat'):
+            try:
+                st = os.stat(os.path.join(self.data_dir, filename))
+                signature.append((filename, st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append((filename, None, None))
+        return tuple(signature)
+    
+    def _load_parsed_cache(self, signature: Tuple) -> bool:
+        """从磁盘缓存恢复解析结果和查找结构，签名不匹配时返回False"""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                # pickle可执行任意代码，只加载当前用户独占写入的缓存文件
+                st = os.fstat(f.fileno())
+                if st.st_mode & 0o022 or (hasattr(os, 'getuid') and st.st_uid != os.getuid()):
+                    print(f"解析缓存文件权限不安全，忽略并重建: {self.cache_path}")
+                    return False
+                cached = pickle.load(f)
+            if cached.get('version') != _PARSED_CACHE_VERSION or cached.get('signature') != signature:
+                return False
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"读取解析缓存失败: {e}")
+            return False
+        
+        with self.lock:
+            self.geosite_data = cached['geosite_data']
+            self.geoip_data = cached['geoip_data']
+            for attr in _LOOKUP_CACHE_ATTRS:
+                setattr(self, attr, cached['lookup'][attr])
+            self._clear_query_caches()
+        
+        print(f"从缓存加载 {self._total_rules} 个域名规则，{len(self.geoip_data)} 个国家/地区的IP段")
+        return True
+    
+    def _save_parsed_cache(self, signature: Tuple):
+        """将解析结果和查找结构写入磁盘缓存"""
+        with self.lock:
+            cached = {
+                'version': _PARSED_CACHE_VERSION,
+                'signature': signature,
+                'geosite_data': self.geosite_data,
+                'geoip_data': self.geoip_data,
+                'lookup': {attr: getattr(self, attr) for attr in _LOOKUP_CACHE_ATTRS},
+            }
+        
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.chmod(tmp_path, 0o600)  # 已存在的临时文件不受os.open的mode影响
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"写入解析缓存失败: {e}")
+    
     def _load_fallback_data(self):
         """加载后备数据（预置最小数据集）"""
         print("使用预置数据集...")
         
         # 导入DomainRule和GeositeEntry
-        from v2ray_dat_parser import DomainRule, GeositeEntry
+        from v2ray_dat_parser import DomainRule
         
         fallback_data = {
             'YOUTUBE': ['youtube.com', 'youtu.be', 'googlevideo.com', 'ytimg.com'],
@@ -221,7 +507,7 @@ class GeositeLoader:
             'ALIBABA': ['taobao.com', 'tmall.com', 'alipay.com']
         }
         
-        self.geosite_data = {}
+        geosite_entries = {}
         for category, domain_strings in fallback_data.items():
             # 将字符串域名转换为DomainRule对象
             domain_rules = []
@@ -229,158 +515,116 @@ class GeositeLoader:
                 rule = DomainRule(rule_type='domain', value=domain_str.lower())
                 domain_rules.append(rule)
             
-            self.geosite_data[category] = GeositeEntry(
+            geosite_entries[category] = GeositeEntry(
                 category=category,
                 domains=domain_rules,
                 domain_count=len(domain_rules)
             )
         
-        self._build_lookup_cache()
+        self._build_lookup_cache(geosite_entries)
+    
+    def _clear_query_caches(self):
+        """清空查询结果缓存"""
+        self._domain_category_cache.cache_clear()
+        self._ip_info_cache.cache_clear()
     
     def get_domain_category(self, domain: str) -> Optional[str]:
         """获取域名的分类 - 支持Domain/Full/Keyword/Regexp规则类型"""
-        domain_lower = domain.lower()
-        
-        with self.lock:
-            matched_categories = []
-            
-            # 遍历所有分类，检查其域名规则
-            for category, entry in self.geosite_data.items():
-                for domain_rule in entry.domains:
-                    if self._match_domain_rule(domain_lower, domain_rule):
-                        if category not in matched_categories:
-                            matched_categories.append(category)
-                        break  # 一个分类匹配即可，进入下一个分类
-            
-            if not matched_categories:
-                return None
-                
-            # 优先级排序：服务分类 > 地理位置分类
-            service_categories = [cat for cat in matched_categories 
-                                if not cat.startswith('GEOLOCATION-') and not cat.startswith('CATEGORY-')]
-            
-            if service_categories:
-                # 优先返回知名服务（更具体的服务优先级更高）
-                priority_services = ['YOUTUBE', 'TIKTOK', 'BYTEDANCE', 'GOOGLE', 'FACEBOOK', 'TWITTER', 
-                                   'TELEGRAM', 'APPLE', 'MICROSOFT', 'AMAZON', 'NETFLIX', 'SPOTIFY',
-                                   'ALIBABA', 'TENCENT', 'BAIDU', 'BILIBILI']
-                
-                for priority in priority_services:
-                    if priority in service_categories:
-                        return priority
-                        
-                # 返回第一个服务分类
-                return service_categories[0]
-            
-            # 如果没有服务分类，返回第一个匹配的分类
-            return matched_categories[0]
+        return self._domain_category_cache(domain.lower())
     
-    def _match_domain_rule(self, domain: str, domain_rule) -> bool:
-        """根据规则类型匹配域名"""
-        try:
-            rule_type = domain_rule.rule_type
-            value = domain_rule.value
+    def _lookup_domain_category(self, domain_lower: str) -> Optional[str]:
+        """在后缀树和keyword/regexp规则中查找域名分类"""
+        # 查找结构构建后只读，持锁取一致的引用快照后即可无锁遍历
+        with self.lock:
+            suffix_trie = self._suffix_trie
+            pattern_filter = self._pattern_filter
+            pattern_rules = self._pattern_rules
+            categories = self._categories
+        
+        matched = set()
+        
+        # 沿反转标签遍历后缀树：途经节点的domain规则均为后缀匹配，终点节点的full规则为完全匹配
+        node = suffix_trie
+        for label in reversed(domain_lower.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            matched.update(node.get(_SUFFIX_MARK, ()))
+        else:
+            matched.update(node.get(_FULL_MARK, ()))
+        
+        # keyword/regexp规则先用合并正则预筛选，命中时再逐条确认所属分类
+        if pattern_filter is not None and pattern_filter.search(domain_lower):
+            for index, rule_type, pattern in pattern_rules:
+                if index in matched:
+                    continue
+                if pattern in domain_lower if rule_type == 'keyword' else pattern.search(domain_lower):
+                    matched.add(index)
+        
+        matched_categories = [categories[index] for index in sorted(matched)]
+        
+        if not matched_categories:
+            return None
             
-            if rule_type == 'full':
-                # 完全匹配
-                return domain == value
-            elif rule_type == 'keyword':
-                # 关键词匹配（包含）
-                return value in domain
-            elif rule_type == 'regexp':
-                # 正则表达式匹配
-                import re
-                try:
-                    return bool(re.search(value, domain))
-                except re.error:
-                    return False
-            elif rule_type == 'domain':
-                # 后缀匹配（默认）
-                return domain == value or domain.endswith('.' + value)
-            else:
-                # 未知规则类型，默认使用后缀匹配
-                return domain == value or domain.endswith('.' + value)
-                
-        except Exception:
-            return False
+        # 优先级排序：服务分类 > 地理位置分类
+        service_categories = [cat for cat in matched_categories 
+                            if not cat.startswith('GEOLOCATION-') and not cat.startswith('CATEGORY-')]
+        
+        if service_categories:
+            # 优先返回知名服务（更具体的服务优先级更高），都不是知名服务时返回第一个服务分类
+            return min(service_categories, key=lambda cat: _PRIORITY_SERVICE_RANK.get(cat, len(_PRIORITY_SERVICE_RANK)))
+        
+        # 如果没有服务分类，返回第一个匹配的分类
+        return matched_categories[0]
     
     def get_ip_country(self, ip: str) -> Optional[str]:
         """获取IP的国家/地区 - 使用增强的服务识别器和GeoIP数据"""
+        return self._ip_info_cache(ip)[0]
+    
+    def get_ip_service(self, ip: str) -> Optional[str]:
+        """根据IP获取服务名称 - 使用增强的服务识别器"""
+        return self._ip_info_cache(ip)[1]
+    
+    def get_ip_info(self, ip: str) -> Tuple[Optional[str], Optional[str]]:
+        """一次查询同时获取 (国家/地区, 服务名称)"""
+        return self._ip_info_cache(ip)
+    
+    def _lookup_ip_info(self, ip: str) -> Tuple[Optional[str], Optional[str]]:
+        """依次查询服务识别器、GeoIP区间表和中国IP检测"""
         try:
-            ip_obj = ipaddress.ip_address(ip)
+            ip_value = ipv4_to_int(ip)
+            if ip_value < 0:
+                # 非IPv4地址仍需校验合法性，非法地址直接返回None
+                ipaddress.ip_address(ip)
             
             # 1. 使用统一的服务识别器 (最高优先级)
-            enhanced_service = unified_service_identifier.identify_service_by_ip(ip)
+            # 只查静态IP数据：DNS反查可能阻塞数秒，由 domain_resolver 并发执行并按主机名识别服务
+            enhanced_service = unified_service_identifier.identify_service_by_ip(ip, use_dns=False)
             if enhanced_service:
-                return enhanced_service.name.lower()
-            
-            # 2. 检查原有GeoIP数据中的特殊服务
-            special_services = ['CLOUDFLARE', 'GOOGLE', 'TELEGRAM', 'FACEBOOK', 'NETFLIX', 'TWITTER', 'FASTLY', 'CLOUDFRONT']
+                service = enhanced_service.name.lower()
+                return service, service
             
-            for service in special_services:
-                if service in self.geoip_data:
-                    for cidr in self.geoip_data[service]:
-                        try:
-                            if ip_obj in ipaddress.ip_network(cidr, strict=False):
-                                return service.lower()
-                        except (ipaddress.AddressValueError, ValueError):
-                            continue
-            
-            # 3. 检查国家代码
-            for country, ip_ranges in self.geoip_data.items():
-                if country in special_services:
-                    continue
-                    
-                for cidr in ip_ranges:
-                    try:
-                        if ip_obj in ipaddress.ip_network(cidr, strict=False):
-                            return country.lower()
-                    except (ipaddress.AddressValueError, ValueError):
-                        continue
+            # 2. 检查原有GeoIP数据中的特殊服务，3. 检查国家代码（区间表已按此优先级构建）
+            if ip_value >= 0:
+                label = _lookup_interval(self._ip_country_table, ip_value)
+                if label:
+                    return label, label if label in _SPECIAL_IP_SERVICE_LABELS else None
             
             # 4. 兜底：使用统一的中国IP检测
             if is_china_ip(ip):
-                return 'cn'
+                return 'cn', None
             else:
-                return None
+                return None, None
             
         except Exception:
-            return None
-    
-    def get_ip_service(self, ip: str) -> Optional[str]:
-        """根据IP获取服务名称 - 使用增强的服务识别器"""
-        try:
-            # 1. 使用统一的服务识别器 (优先级最高)
-            enhanced_service = unified_service_identifier.identify_service_by_ip(ip)
-            if enhanced_service:
-                return enhanced_service.name.lower()
-            
-            # 2. 回退到原有GeoIP数据查找
-            ip_obj = ipaddress.ip_address(ip)
-            special_services = [
-                'cloudflare', 'google', 'telegram', 'facebook', 
-                'netflix', 'twitter', 'fastly', 'cloudfront'
-            ]
-            
-            for service in special_services:
-                if service.upper() in self.geoip_data:
-                    for cidr in self.geoip_data[service.upper()]:
-                        try:
-                            if ip_obj in ipaddress.ip_network(cidr, strict=False):
-                                return service
-                        except (ipaddress.AddressValueError, ValueError):
-                            continue
-            
-            return None
-        except Exception:
-            return None
+            return None, None
     
     def get_stats(self) -> Dict:
         """获取数据统计信息"""
         with self.lock:
             return {
                 'geosite_categories': len(self.geosite_data),
-                'total_domains': len(self.domain_to_category),
+                'total_domains': self._total_rules,
                 'geoip_countries': len(self.geoip_data),
                 'last_update': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.last_update))
             }
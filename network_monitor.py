@@ -7,17 +7,20 @@
 
 import time
 import json
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 import threading
 import socket
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 # 导入增强的域名解析器和GeoSite数据
 from domain_resolver import domain_resolver
 from geosite_loader import geosite_loader
-from utils import is_china_ip, get_country_name
+from utils import is_china_ip, get_country_name, parse_ipv4_networks, ip_in_networks, ipv4_to_int, shutdown_executor
 from data_collector import create_data_collector
+from unified_service_identifier import unified_service_identifier
 
 try:
     from rich.console import Console
@@ -33,6 +36,86 @@ except ImportError:
     print("请安装rich库: pip install rich")
     exit(1)
 
+# 连接过滤用的IP段，预解析为 (网络地址, 掩码) 整数对
+_LOCAL_NETWORKS = parse_ipv4_networks(['192.168.0.0/16', '10.0.0.0/8', '28.0.0.0/8', '172.16.0.0/12'])
+_NONFOREIGN_NETWORKS = parse_ipv4_networks(['192.168.0.0/16', '10.0.0.0/8', '172.0.0.0/8',
+                                            '127.0.0.0/8', '28.0.0.0/8', '169.254.0.0/16'])
+
+# 特殊域名映射 {域名后缀: (服务, 地区)}，按标签边界匹配
+_SPECIAL_DOMAINS = {
+    '1e100.net': ('Google', '海外'),
+    'dns.google': ('Google', '海外'),
+    'googleusercontent.com': ('Google', '海外'),
+    'googlevideo.com': ('YouTube', '海外'),
+    'youtube-nocookie.com': ('YouTube', '海外'),
+    'ytimg.com': ('YouTube', '海外'),
+    'youtu.be': ('YouTube', '海外'),
+    'youtube.com': ('YouTube', '海外'),
+    'alidns.com': ('阿里系', '中国'),
+    'alicdn.com': ('阿里系', '中国'),
+    'dnspod.com': ('腾讯/QQ', '中国'),
+    'gtimg.com': ('腾讯/QQ', '中国'),
+    'qq.com': ('腾讯/QQ', '中国'),
+    'amazonaws.com': ('Amazon', '海外'),
+    'cloudfront.net': ('Amazon', '海外'),
+    'awsstatic.com': ('Amazon', '海外'),
+    'telegram.com': ('Telegram', '海外'),
+    'telegram.org': ('Telegram', '海外'),
+    'tailscale.com': ('Tailscale', '海外'),
+    'akamaitechnologies.com': ('Akamai CDN', '海外'),
+    'akamaized.net': ('Akamai CDN', '海外'),
+    'cloudflare.com': ('Cloudflare', '海外'),
+    'cdninstagram.com': ('Facebook', '海外'),
+    'fbcdn.net': ('Facebook', '海外'),
+}
+
+# GeoSite分类到显示名称的映射
+_CATEGORY_DISPLAY_NAMES = {
+    'youtube': 'YouTube',
+    'google': 'Google',
+    'facebook': 'Facebook',
+    'twitter': 'Twitter/X',
+    'telegram': 'Telegram',
+    'apple': 'Apple',
+    'microsoft': 'Microsoft',
+    'amazon': 'Amazon',
+    'netflix': 'Netflix',
+    'spotify': 'Spotify',
+    'github': 'GitHub',
+    'cloudflare': 'Cloudflare',
+    'baidu': '百度',
+    'tencent': '腾讯/QQ',
+    'alibaba': '阿里系',
+    'bytedance': '抖音/TikTok',
+    'tiktok': '抖音/TikTok',
+    'bilibili': 'B站',
+}
+
+# 抖音/字节跳动已知IP段 (起始, 结束, 服务, 地区)，基于真实观察
+_DOUYIN_IP_RANGES = [
+    (ipv4_to_int(start), ipv4_to_int(end), service, location)
+    for start, end, service, location in (
+        ('122.14.220.0', '122.14.235.255', '抖音/TikTok', '中国'),
+        ('123.14.220.0', '123.14.235.255', '抖音/TikTok', '中国'),
+        ('117.93.180.0', '117.93.200.255', '抖音/TikTok', '中国'),
+        ('110.43.0.0', '110.43.50.255', '抖音/TikTok', '中国'),
+        ('36.51.0.0', '36.51.255.255', '抖音/TikTok', '中国'),
+        # TikTok海外IP段
+        ('108.20.0.0', '108.30.255.255', '抖音/TikTok', '海外'),
+        ('151.101.0.0', '151.101.255.255', '抖音/TikTok', '海外'),
+    )
+]
+
+# 抖音常用的CDN IP段 (第一段, 第二段)
+_DOUYIN_CDN_PREFIXES = frozenset({
+    (39, 137), (39, 173), (39, 135), (117, 135),
+    (36, 156), (183, 192), (111, 62), (221, 181), (120, 202)
+})
+
+# 中国IP段的启发式检测（按第一段）
+_CHINA_FIRST_OCTETS = frozenset({110, 111, 112, 113, 114, 115, 116, 117, 118, 119,
+                                 120, 121, 122, 123, 124, 125, 36, 39, 42, 49, 58, 59, 60, 61})
+
 class NetworkMonitor:
     def __init__(self, config_file="config.json"):
         self.console = Console()
@@ -40,6 +123,7 @@ class NetworkMonitor:
         self.running = False
         self.start_time = datetime.now()  # 记录启动时间
         self.config = self._load_config(config_file)
+        self._parse_network_ranges()
         
         # 初始化其他属性
         self._initialize_data_structures()
@@ -70,6 +154,15 @@ class NetworkMonitor:
                 }
             }
         
+    def _parse_network_ranges(self):
+        """从配置解析代理/本地IP段前缀，只在加载配置时计算一次"""
+        network_settings = self.config['network_settings']
+        self.proxy_prefixes = [ip_range.split('/')[0].rsplit('.', 1)[0] + '.' for ip_range in network_settings['proxy_ip_ranges']]
+        self.local_prefixes = [ip_range.split('/')[0].rsplit('.', 1)[0] + '.' for ip_range in network_settings['local_ip_ranges']]
+        # 按整数掩码比较判断网段归属
+        self.proxy_networks = parse_ipv4_networks(network_settings['proxy_ip_ranges'])
+        self.local_networks = parse_ipv4_networks(network_settings['local_ip_ranges'])
+    
     def _initialize_data_structures(self):
         """初始化所有数据结构"""
         # 简化数据存储 - 避免重复
@@ -104,6 +197,14 @@ class NetworkMonitor:
         # 连接跟踪（用于流量模式推断）
         self.recent_connections = set()  # 最近的连接IP
         self.connection_history = deque(maxlen=100)  # 连接历史
+        # 按IP前两段 (ip >> 16) 统计最近连接数，按加入顺序淘汰超出上限的IP
+        self.max_recent_connections = self.config.get('monitoring', {}).get('max_recent_connections', 1000)
+        self._recent_connection_order = deque()  # [(ip, ip_value)]
+        self._recent_prefix_counts = Counter()
+        
+        # 主机名后台解析，避免在持有data_lock时阻塞于反向DNS查询
+        self._hostname_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='hostname-resolver')
+        self._hostname_futures = {}  # {ip: Future}
         
         # 初始化数据收集器
         try:
@@ -115,16 +216,31 @@ class NetworkMonitor:
             raise
     
     def _resolve_hostname(self, ip: str) -> str:
-        """解析IP对应的主机名"""
-        try:
-            hostname = socket.gethostbyaddr(ip)[0]
+        """提交后台主机名解析，先返回占位名称，解析结果在后续刷新时回填
+        
+        设备IP都是局域网地址，本地DNS（路由器）通常有其PTR记录，因此这里不像
+        domain_resolver 那样跳过私有地址
+        """
+        # 停止后线程池已关闭，收尾中的监控线程不再提交
+        if self.running and ip not in self._hostname_futures:
+            self._hostname_futures[ip] = self._hostname_pool.submit(socket.gethostbyaddr, ip)
+        return f"设备-{ip.split('.')[-1]}"
+    
+    def _apply_resolved_hostnames(self):
+        """将已完成的后台主机名解析结果写回设备记录"""
+        for ip, future in list(self._hostname_futures.items()):
+            if not future.done():
+                continue
+            del self._hostname_futures[ip]
+            try:
+                hostname = future.result()[0]
+            except (socket.herror, socket.gaierror, OSError):
+                continue
             if hostname != ip and '.' in hostname:
                 # 简化主机名显示
-                return hostname.split('.')[0]
-            return hostname
-        except:
-            pass
-        return f"设备-{ip.split('.')[-1]}"
+                hostname = hostname.split('.')[0]
+            if ip in self.device_stats:
+                self.device_stats[ip]['hostname'] = hostname
     
     def _get_active_connections(self) -> List[Dict]:
         """获取活跃的网络连接"""
@@ -139,12 +255,14 @@ class NetworkMonitor:
                 foreign_ip = conn['foreign_ip']
                 
                 # 只关心本地到外网的连接
-                is_local = (local_ip.startswith(('192.168.', '10.', '28.')) or 
-                          (local_ip.startswith('172.') and 16 <= int(local_ip.split('.')[1]) <= 31))
-                is_foreign = not foreign_ip.startswith(('192.168.', '10.', '172.', '127.', '28.', 'fe80', 'fd', '169.254'))
+                if not ip_in_networks(local_ip, _LOCAL_NETWORKS):
+                    continue
+                foreign_value = ipv4_to_int(foreign_ip)
+                is_foreign = foreign_value >= 0 and not any(
+                    foreign_value & mask == network for network, mask in _NONFOREIGN_NETWORKS)
                 
-                if is_local and is_foreign:
-                    conn_key = f"{local_ip}->{foreign_ip}"
+                if is_foreign:
+                    conn_key = (local_ip, foreign_ip)
                     if conn_key not in seen_connections:
                         seen_connections.add(conn_key)
                         connections.append({
@@ -157,15 +275,11 @@ class NetworkMonitor:
         except:
             return []
     
-    def _resolve_domain(self, ip: str) -> str:
-        """增强的IP到域名解析"""
-        return domain_resolver.resolve_domain(ip)
-    
     def _detect_ip_service(self, ip: str) -> Optional[Tuple[str, str]]:
         """通过IP识别服务（如Telegram、Google、Cloudflare等）"""
         try:
-            # 先检查国家识别是否为特殊服务
-            country = geosite_loader.get_ip_country(ip)
+            # 一次查询同时获取国家和服务，先检查国家识别是否为特殊服务
+            country, ip_service = geosite_loader.get_ip_info(ip)
             if country:
                 service_map = {
                     'google': 'Google',
@@ -181,7 +295,6 @@ class NetworkMonitor:
                     return service_map[country], '海外服务'
                     
             # 备用方法：通过专门的服务识别
-            ip_service = geosite_loader.get_ip_service(ip)
             if ip_service and ip_service in service_map:
                 return service_map[ip_service], '海外服务'
                 
@@ -190,39 +303,16 @@ class NetworkMonitor:
         return None
     
     def _check_special_domain_mappings(self, domain_lower: str) -> Optional[Tuple[str, str]]:
-        """检查特殊域名映射"""
-        special_domains = {
-            '1e100.net': ('Google', '海外'),
-            'dns.google': ('Google', '海外'), 
-            'googleusercontent.com': ('Google', '海外'),
-            'googlevideo.com': ('YouTube', '海外'),
-            'youtube-nocookie.com': ('YouTube', '海外'),
-            'ytimg.com': ('YouTube', '海外'),
-            'youtu.be': ('YouTube', '海外'),
-            'youtube.com': ('YouTube', '海外'),
-            'alidns.com': ('阿里系', '中国'),
-            'alicdn.com': ('阿里系', '中国'),
-            'dnspod.com': ('腾讯/QQ', '中国'),
-            'gtimg.com': ('腾讯/QQ', '中国'),
-            'qq.com': ('腾讯/QQ', '中国'),
-            'amazonaws.com': ('Amazon', '海外'),
-            'cloudfront.net': ('Amazon', '海外'),
-            'awsstatic.com': ('Amazon', '海外'),
-            'telegram.com': ('Telegram', '海外'),
-            'telegram.org': ('Telegram', '海外'),
-            'tailscale.com': ('Tailscale', '海外'),
-            'akamaitechnologies.com': ('Akamai CDN', '海外'),
-            'akamaized.net': ('Akamai CDN', '海外'),
-            'cloudflare.com': ('Cloudflare', '海外'),
-            'cdninstagram.com': ('Facebook', '海外'),
-            'fbcdn.net': ('Facebook', '海外')
-        }
-        
-        for special_domain, (service, location) in special_domains.items():
-            if domain_lower.endswith(special_domain) or domain_lower == special_domain:
-                return service, location
-        
-        return None
+        """检查特殊域名映射 - 从完整域名开始逐级去掉最左侧标签查表"""
+        suffix = domain_lower
+        while True:
+            mapping = _SPECIAL_DOMAINS.get(suffix)
+            if mapping:
+                return mapping
+            dot = suffix.find('.')
+            if dot < 0:
+                return None
+            suffix = suffix[dot + 1:]
     
     def _lookup_geosite_database(self, domain_lower: str, ip: str) -> Optional[Tuple[str, str]]:
         """使用GeoSite数据库进行域名分类"""
@@ -242,28 +332,7 @@ class NetworkMonitor:
     
     def _standardize_category_name(self, category: str) -> str:
         """标准化分类名称"""
-        category_map = {
-            'youtube': 'YouTube',
-            'google': 'Google',
-            'facebook': 'Facebook',
-            'twitter': 'Twitter/X',
-            'telegram': 'Telegram',
-            'apple': 'Apple',
-            'microsoft': 'Microsoft',
-            'amazon': 'Amazon',
-            'netflix': 'Netflix',
-            'spotify': 'Spotify',
-            'github': 'GitHub',
-            'cloudflare': 'Cloudflare',
-            'baidu': '百度',
-            'tencent': '腾讯/QQ',
-            'alibaba': '阿里系',
-            'bytedance': '抖音/TikTok',
-            'tiktok': '抖音/TikTok',
-            'bilibili': 'B站'
-        }
-        
-        return category_map.get(category.lower(), category.capitalize())
+        return _CATEGORY_DISPLAY_NAMES.get(category.lower(), category.capitalize())
     
     def _identify_by_ip_ranges(self, domain: str, ip: str) -> Optional[Tuple[str, str]]:
         """通过IP范围启发式识别服务"""
@@ -273,26 +342,12 @@ class NetworkMonitor:
     
     def _check_douyin_ip_ranges(self, ip: str) -> Optional[Tuple[str, str]]:
         """检查抖音/字节跳动已知IP段"""
-        try:
-            octets = [int(x) for x in ip.split('.')]
-            first, second, third = octets[0], octets[1], octets[2]
-            
-            # 抖音/字节跳动常用IP段（基于真实观察）
-            if (first == 122 and second == 14 and 220 <= third <= 235) or \
-               (first == 123 and second == 14 and 220 <= third <= 235) or \
-               (first == 117 and second == 93 and 180 <= third <= 200) or \
-               (first == 110 and second == 43 and 0 <= third <= 50) or \
-               (first == 36 and second == 51 and 0 <= third <= 255):
-                return '抖音/TikTok', '中国'
-            
-            # TikTok海外IP段
-            if (first == 108 and 20 <= second <= 30) or \
-               (first == 151 and second == 101):
-                return '抖音/TikTok', '海外'
-        
-        except (ValueError, IndexError):
-            pass
-        
+        ip_value = ipv4_to_int(ip)
+        if ip_value < 0:
+            return None
+        for start, end, service, location in _DOUYIN_IP_RANGES:
+            if start <= ip_value <= end:
+                return service, location
         return None
     
     def _analyze_traffic_patterns(self, ip: str) -> Optional[Tuple[str, str]]:
@@ -315,61 +370,44 @@ class NetworkMonitor:
     
     def _check_douyin_cdn_patterns(self, ip: str) -> Optional[Tuple[str, str]]:
         """检查抖音CDN特征"""
-        try:
-            octets = [int(x) for x in ip.split('.')]
-            first, second = octets[0], octets[1]
-            
-            # 抖音常用的CDN IP范围
-            douyin_cdn_patterns = [
-                (39, 137), (39, 173), (39, 135), (117, 135),
-                (36, 156), (183, 192), (111, 62), (221, 181), (120, 202)
-            ]
+        ip_value = ipv4_to_int(ip)
+        if ip_value < 0:
+            return None
+        first, second = ip_value >> 24, (ip_value >> 16) & 0xFF
+        
+        if (first, second) in _DOUYIN_CDN_PREFIXES:
+            if hasattr(self, '_recent_prefix_counts'):
+                similar_count = self._recent_prefix_counts.get(ip_value >> 16, 0)
+                
+                if similar_count >= 2:
+                    return '抖音/TikTok', '中国'
             
-            for cdn_first, cdn_second in douyin_cdn_patterns:
-                if first == cdn_first and second == cdn_second:
-                    if hasattr(self, 'recent_connections'):
-                        prefix_match = f'{first}.{second}'
-                        similar_count = sum(1 for conn_ip in self.recent_connections 
-                                          if conn_ip.startswith(prefix_match))
-                        
-                        if similar_count >= 2:
-                            return '抖音/TikTok', '中国'
-                    
-                    return '疑似抖音/TikTok', '中国'
-        
-        except (ValueError, IndexError):
-            pass
+            return '疑似抖音/TikTok', '中国'
         
         return None
     
     def _check_video_service_patterns(self, ip: str) -> Optional[Tuple[str, str]]:
         """检查通用视频服务模式"""
-        try:
-            octets = [int(x) for x in ip.split('.')]
-            first = octets[0]
+        ip_value = ipv4_to_int(ip)
+        if ip_value < 0 or (ip_value >> 24) not in _CHINA_FIRST_OCTETS:
+            return None
+        
+        if hasattr(self, '_recent_prefix_counts'):
+            similar_count = self._recent_prefix_counts.get(ip_value >> 16, 0)
+            if ip in self.recent_connections:
+                similar_count -= 1  # 不计入自身
             
-            if hasattr(self, 'recent_connections'):
-                ip_prefix = '.'.join(ip.split('.')[:2])
-                similar_ips = [conn_ip for conn_ip in self.recent_connections 
-                             if conn_ip.startswith(ip_prefix) and conn_ip != ip]
-                
-                if len(similar_ips) >= 3:
-                    # 中国IP段的启发式检测
-                    china_ip_ranges = [110, 111, 112, 113, 114, 115, 116, 117, 118, 119,
-                                     120, 121, 122, 123, 124, 125, 36, 39, 42, 49, 58, 59, 60, 61]
-                    if first in china_ip_ranges:
-                        return '视频服务', '中国'
-        
-        except (ValueError, IndexError):
-            pass
+            if similar_count >= 3:
+                # 中国IP段的启发式检测
+                return '视频服务', '中国'
         
         return None
     
     def _try_smart_ip_identification(self, ip: str) -> Optional[Tuple[str, str]]:
         """尝试智能IP识别"""
         try:
-            from unified_service_identifier import unified_service_identifier
-            provider, region, confidence = unified_service_identifier.identify_ip(ip)
+            # DNS反查已由 domain_resolver 完成并体现在域名分类中，这里只查静态数据
+            provider, region, confidence = unified_service_identifier.identify_ip(ip, use_dns=False)
             
             if confidence > 0.5:
                 return provider, region
@@ -463,6 +501,7 @@ class NetworkMonitor:
     
     def _update_device_records(self, arp_devices, connections):
         """更新设备记录，包括ARP设备和虚拟设备"""
+        self._apply_resolved_hostnames()
         current_devices = set()
         
         # 处理ARP表中的设备
@@ -490,15 +529,22 @@ class NetworkMonitor:
     
     def _create_virtual_devices(self, connections, current_devices, arp_devices):
         """创建虚拟设备（Clash VPN设备和直连设备）"""
-        # 从配置文件读取IP范围前缀
-        proxy_prefixes = [ip_range.split('/')[0].rsplit('.', 1)[0] + '.' for ip_range in self.config['network_settings']['proxy_ip_ranges']]
-        local_prefixes = [ip_range.split('/')[0].rsplit('.', 1)[0] + '.' for ip_range in self.config['network_settings']['local_ip_ranges']]
+        # 显示用的IP范围前缀
+        proxy_prefixes = self.proxy_prefixes
+        local_prefixes = self.local_prefixes
         
-        vpn_connections = [conn for conn in connections if any(conn['local_ip'].startswith(prefix) for prefix in proxy_prefixes)]
-        local_connections = [conn for conn in connections if any(conn['local_ip'].startswith(prefix) for prefix in local_prefixes)]
+        # 一次遍历统计代理/直连连接数
+        vpn_connection_count = 0
+        local_connection_count = 0
+        for conn in connections:
+            local_ip = conn['local_ip']
+            if ip_in_networks(local_ip, self.proxy_networks):
+                vpn_connection_count += 1
+            if ip_in_networks(local_ip, self.local_networks):
+                local_connection_count += 1
         
         # 创建Clash设备（TUN模式）
-        if vpn_connections:
+        if vpn_connection_count:
             clash_key = "Clash设备"
             current_devices.add(clash_key)
             if clash_key not in self.device_stats:
@@ -506,18 +552,18 @@ class NetworkMonitor:
                 self.device_stats[clash_key] = {
                     'ip': proxy_ip_display,
                     'mac': 'virtual',
-                    'hostname': f'Clash代理({len(vpn_connections)}个连接)',
+                    'hostname': f'Clash代理({vpn_connection_count}个连接)',
                     'bytes_in': 0,
                     'bytes_out': 0,
                     'last_seen': datetime.now(),
                     'is_local': False
                 }
             else:
-                self.device_stats[clash_key]['hostname'] = f'Clash代理({len(vpn_connections)}个连接)'
+                self.device_stats[clash_key]['hostname'] = f'Clash代理({vpn_connection_count}个连接)'
                 self.device_stats[clash_key]['last_seen'] = datetime.now()
         
         # 创建直连设备（绕过Clash的流量）
-        if local_connections:
+        if local_connection_count:
             direct_key = "直连设备"
             current_devices.add(direct_key)
             if direct_key not in self.device_stats:
@@ -527,14 +573,14 @@ class NetworkMonitor:
                 self.device_stats[direct_key] = {
                     'ip': f'{main_ip}(多端口)',
                     'mac': arp_devices.get(main_ip, 'unknown'),
-                    'hostname': f'{hostname}({len(local_connections)}个直连)',
+                    'hostname': f'{hostname}({local_connection_count}个直连)',
                     'bytes_in': 0,
                     'bytes_out': 0,
                     'last_seen': datetime.now(),
                     'is_local': True
                 }
             else:
-                self.device_stats[direct_key]['hostname'] = f'mmini({len(local_connections)}个直连)'
+                self.device_stats[direct_key]['hostname'] = f'mmini({local_connection_count}个直连)'
                 self.device_stats[direct_key]['last_seen'] = datetime.now()
     
     def _calculate_traffic_deltas(self, interface_stats, last_interface_stats):
@@ -551,8 +597,8 @@ class NetworkMonitor:
         
         return total_period_traffic_in, total_period_traffic_out
     
-    def _process_connections_and_domains(self, connections, current_devices, arp_devices):
-        """处理连接并进行域名分类"""
+    def _process_connections_and_domains(self, connections, current_devices, arp_devices, resolved_domains):
+        """处理连接并进行域名分类，resolved_domains 为本轮 resolve_many 的结果"""
         device_connections = defaultdict(int)
         domain_connections = defaultdict(set)
         
@@ -561,7 +607,7 @@ class NetworkMonitor:
             foreign_ip = conn['foreign_ip']
             
             # 跟踪连接IP（用于流量模式推断）
-            self.recent_connections.add(foreign_ip)
+            self._track_recent_connection(foreign_ip)
             self.connection_history.append((foreign_ip, time.time()))
             
             # 确定设备
@@ -569,20 +615,35 @@ class NetworkMonitor:
             device_connections[device_key] += 1
             
             # 处理域名和网站分类
-            website_name = self._process_domain_classification(foreign_ip, device_key)
+            website_name = self._process_domain_classification(foreign_ip, device_key, resolved_domains[foreign_ip])
             domain_connections[website_name].add(device_key)
         
         return device_connections, domain_connections
     
+    def _track_recent_connection(self, foreign_ip):
+        """记录最近连接的IP并维护前缀计数，超过上限时淘汰最早加入的IP"""
+        if foreign_ip in self.recent_connections:
+            return
+        ip_value = ipv4_to_int(foreign_ip)
+        self.recent_connections.add(foreign_ip)
+        self._recent_connection_order.append((foreign_ip, ip_value))
+        if ip_value >= 0:
+            self._recent_prefix_counts[ip_value >> 16] += 1
+        
+        if len(self._recent_connection_order) > self.max_recent_connections:
+            old_ip, old_value = self._recent_connection_order.popleft()
+            self.recent_connections.discard(old_ip)
+            if old_value >= 0:
+                prefix = old_value >> 16
+                self._recent_prefix_counts[prefix] -= 1
+                if not self._recent_prefix_counts[prefix]:
+                    del self._recent_prefix_counts[prefix]
+    
     def _determine_device_key(self, local_ip, current_devices, arp_devices):
         """确定连接对应的设备键"""
-        # 从配置文件读取IP范围前缀
-        proxy_prefixes = [ip_range.split('/')[0].rsplit('.', 1)[0] + '.' for ip_range in self.config['network_settings']['proxy_ip_ranges']]
-        local_prefixes = [ip_range.split('/')[0].rsplit('.', 1)[0] + '.' for ip_range in self.config['network_settings']['local_ip_ranges']]
-        
-        if any(local_ip.startswith(prefix) for prefix in proxy_prefixes):
+        if ip_in_networks(local_ip, self.proxy_networks):
             return "Clash设备"
-        elif any(local_ip.startswith(prefix) for prefix in local_prefixes):
+        elif ip_in_networks(local_ip, self.local_networks):
             return "直连设备"
         else:
             device_key = local_ip
@@ -599,13 +660,12 @@ class NetworkMonitor:
                 }
             return device_key
     
-    def _process_domain_classification(self, foreign_ip, device_key):
-        """处理域名解析和分类"""
-        raw_domain = self._resolve_domain(foreign_ip)
+    def _process_domain_classification(self, foreign_ip, device_key, raw_domain):
+        """根据已解析的域名进行网站分类"""
         category, location = self._categorize_domain(raw_domain, foreign_ip)
         
         # 优先使用网站分类作为显示名称，实现服务合并
-        if category and category not in ['中国网站', '海外网站']:
+        if category and category not in {'中国网站', '海外网站'}:
             website_name = category
         else:
             if raw_domain != foreign_ip and not raw_domain.endswith('(未知网站)'):
@@ -614,8 +674,10 @@ class NetworkMonitor:
                 website_name = f"{foreign_ip}(未知网站)"
         
         # 更新网站信息
-        if website_name not in self.domain_stats[device_key]:
-            self.domain_stats[device_key][website_name] = {
+        device_sites = self.domain_stats[device_key]
+        site_stats = device_sites.get(website_name)
+        if site_stats is None:
+            device_sites[website_name] = {
                 'bytes_up': 0,
                 'bytes_down': 0,
                 'connections': 0,
@@ -624,9 +686,9 @@ class NetworkMonitor:
                 'category': category
             }
         else:
-            self.domain_stats[device_key][website_name]['category'] = category
-            self.domain_stats[device_key][website_name]['location'] = location
-            self.domain_stats[device_key][website_name]['ips'].add(foreign_ip)
+            site_stats['category'] = category
+            site_stats['location'] = location
+            site_stats['ips'].add(foreign_ip)
         
         return website_name
     
@@ -638,11 +700,9 @@ class NetworkMonitor:
             for device_key, conn_count in device_connections.items():
                 if device_key in current_devices:
                     traffic_share = (conn_count / total_connections) * total_period_traffic
-                    increment_in = traffic_share * 0.6
-                    increment_out = traffic_share * 0.4
-                    
-                    self.device_stats[device_key]['bytes_in'] += increment_in
-                    self.device_stats[device_key]['bytes_out'] += increment_out
+                    device = self.device_stats[device_key]
+                    device['bytes_in'] += traffic_share * 0.6
+                    device['bytes_out'] += traffic_share * 0.4
     
     def _allocate_traffic_to_websites(self, total_period_traffic_in, total_period_traffic_out, domain_connections):
         """分配流量到网站"""
@@ -663,28 +723,28 @@ class NetworkMonitor:
                     
                     for device_key in connected_devices:
                         if device_key in self.domain_stats:
-                            self.domain_stats[device_key][website_name]['bytes_down'] += per_device_down
-                            self.domain_stats[device_key][website_name]['bytes_up'] += per_device_up
-                            self.domain_stats[device_key][website_name]['connections'] = len(self.domain_stats[device_key][website_name]['ips'])
+                            site_stats = self.domain_stats[device_key][website_name]
+                            site_stats['bytes_down'] += per_device_down
+                            site_stats['bytes_up'] += per_device_up
+                            site_stats['connections'] = len(site_stats['ips'])
     
     def _calculate_website_weights(self, domain_connections):
         """计算网站权重（考虑IP多样性）"""
         website_weights = {}
         
         for website_name, connected_devices in domain_connections.items():
-            # 获取该网站的实际IP数量
-            unique_ips = set()
+            # 获取该网站的实际IP数量，只有一个设备时无需合并集合
+            ip_sets = []
             for device_key in connected_devices:
-                if device_key in self.domain_stats and website_name in self.domain_stats[device_key]:
-                    unique_ips.update(self.domain_stats[device_key][website_name]['ips'])
+                site_stats = self.domain_stats[device_key].get(website_name) if device_key in self.domain_stats else None
+                if site_stats is not None:
+                    ip_sets.append(site_stats['ips'])
             
             device_count = len(connected_devices)
-            ip_diversity = len(unique_ips)
+            ip_diversity = len(ip_sets[0]) if len(ip_sets) == 1 else len(set().union(*ip_sets))
             
-            # 使用哈希因子避免完全相同的权重
-            import hashlib
-            name_hash = int(hashlib.md5(website_name.encode()).hexdigest()[:8], 16)
-            hash_factor = 0.9 + (name_hash % 100) / 500
+            # 使用哈希因子避免完全相同的权重（CRC32足够，且跨进程稳定）
+            hash_factor = 0.9 + (zlib.crc32(website_name.encode()) % 100) / 500
             
             weight = (device_count + ip_diversity * 0.5) * hash_factor
             website_weights[website_name] = weight
@@ -697,8 +757,12 @@ class NetworkMonitor:
         time_delta = current_time - self.last_speed_time
         
         if time_delta > 0:
-            total_up_traffic = sum(d['bytes_out'] for d in self.device_stats.values())
-            total_down_traffic = sum(d['bytes_in'] for d in self.device_stats.values())
+            # 一次遍历同时累计上下行流量
+            total_up_traffic = 0
+            total_down_traffic = 0
+            for device in self.device_stats.values():
+                total_up_traffic += device['bytes_out']
+                total_down_traffic += device['bytes_in']
             
             period_up_traffic = total_up_traffic - self.last_total_bytes_up
             period_down_traffic = total_down_traffic - self.last_total_bytes_down
@@ -739,6 +803,9 @@ class NetworkMonitor:
                 # 1. 收集网络数据
                 arp_devices, connections, interface_stats = self._collect_network_data()
                 
+                # 批量解析本轮出现的外部IP，反向查询并发执行且共用一个超时，不占用data_lock
+                resolved_domains = domain_resolver.resolve_many([conn['foreign_ip'] for conn in connections])
+                
                 with self.data_lock:
                     # 2. 更新设备记录
                     current_devices = self._update_device_records(arp_devices, connections)
@@ -750,7 +817,7 @@ class NetworkMonitor:
                     
                     # 4. 处理连接和域名分类
                     device_connections, domain_connections = self._process_connections_and_domains(
-                        connections, current_devices, arp_devices)
+                        connections, current_devices, arp_devices, resolved_domains)
                     
                     # 5. 分配流量到设备
                     self._allocate_traffic_to_devices(total_period_traffic, device_connections, current_devices)
@@ -1489,8 +1556,15 @@ class NetworkMonitor:
                     time.sleep(1)
                     live.update(self.create_layout())
         except KeyboardInterrupt:
-            self.running = False
             self.console.print("\n[yellow]监控已停止[/yellow]")
+        finally:
+            self.stop()
+    
+    def stop(self):
+        """停止监控，关闭主机名和域名的后台解析线程池"""
+        self.running = False
+        shutdown_executor(self._hostname_pool)
+        domain_resolver.close()
 
 def main():
     console = Console()
@@ -9,6 +9,11 @@ import sys
 import os
 from test_v2ray_parser import run_parser_tests
 from test_unified_service_identifier import run_unified_service_tests
+from test_utils import run_utils_tests
+from test_data_collector import run_data_collector_tests
+from test_geosite_loader import run_geosite_loader_tests
+from test_domain_resolver import run_domain_resolver_tests
+from test_network_monitor import run_network_monitor_tests
 
 def run_all_tests():
     """运行所有测试套件"""
@@ -32,6 +37,41 @@ def run_all_tests():
     test_results.append(("统一服务识别器", service_success))
     print()
     
+    # 3. 通用工具函数测试
+    print("3️⃣  通用工具函数测试")
+    print("-" * 30)
+    utils_success = run_utils_tests()
+    test_results.append(("通用工具函数", utils_success))
+    print()
+    
+    # 4. 数据收集器测试
+    print("4️⃣  数据收集器测试")
+    print("-" * 30)
+    collector_success = run_data_collector_tests()
+    test_results.append(("数据收集器", collector_success))
+    print()
+    
+    # 5. GeoSite数据加载器测试
+    print("5️⃣  GeoSite数据加载器测试")
+    print("-" * 30)
+    geosite_success = run_geosite_loader_tests()
+    test_results.append(("GeoSite加载器", geosite_success))
+    print()
+    
+    # 6. 域名解析器测试
+    print("6️⃣  域名解析器测试")
+    print("-" * 30)
+    resolver_success = run_domain_resolver_tests()
+    test_results.append(("域名解析器", resolver_success))
+    print()
+    
+    # 7. 网络监控器测试
+    print("7️⃣  网络监控器测试")
+    print("-" * 30)
+    monitor_success = run_network_monitor_tests()
+    test_results.append(("网络监控器", monitor_success))
+    print()
+    
     # 输出总结报告
     print("=" * 60)
     print("🎯 测试总结报告")
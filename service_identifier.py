@@ -10,6 +10,7 @@ import ipaddress
 import re
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
+from utils import ipv4_to_int, parse_ipv4_networks
 
 @dataclass
 class ServiceInfo:
@@ -27,6 +28,13 @@ class ServiceIdentifier:
         self.asn_database = self._build_asn_database()
         self.ip_range_database = self._build_ip_range_database()
         self.domain_patterns = self._build_domain_patterns()
+        # IP段预解析为 (网络地址, 掩码, 服务) 整数表
+        self._ip_range_table = [(network, mask, info)
+                                for cidr, info in self.ip_range_database.items()
+                                for network, mask in parse_ipv4_networks([cidr])]
+        # 预编译正则，匹配时不再经过re模块的缓存查找
+        self._compiled_domain_patterns = [(re.compile(pattern), info)
+                                          for pattern, info in self.domain_patterns.items()]
         
     def _build_asn_database(self) -> Dict[int, ServiceInfo]:
         """构建ASN到服务的映射数据库"""
@@ -237,15 +245,14 @@ class ServiceIdentifier:
     def identify_service_by_ip(self, ip: str) -> Optional[ServiceInfo]:
         """基于IP地址识别服务"""
         try:
-            ip_obj = ipaddress.ip_address(ip)
+            ipaddress.ip_address(ip)  # 校验地址格式
             
             # 1. 检查特定IP段数据库 (最高优先级)
-            for cidr, service_info in self.ip_range_database.items():
-                try:
-                    if ip_obj in ipaddress.ip_network(cidr, strict=False):
+            ip_value = ipv4_to_int(ip)
+            if ip_value >= 0:
+                for network, mask, service_info in self._ip_range_table:
+                    if ip_value & mask == network:
                         return service_info
-                except (ipaddress.AddressValueError, ValueError):
-                    continue
             
             # 2. 基于ASN的服务识别 (中等优先级)
             asn_result = self._identify_by_asn_heuristics(ip)
@@ -376,8 +383,8 @@ class ServiceIdentifier:
         """基于域名识别服务"""
         domain_lower = domain.lower()
         
-        for pattern, service_info in self.domain_patterns.items():
-            if re.match(pattern, domain_lower):
+        for pattern, service_info in self._compiled_domain_patterns:
+            if pattern.match(domain_lower):
                 return service_info
                 
         return None
@@ -416,7 +423,7 @@ class ServiceIdentifier:
     def is_media_service(self, ip: str, domain: str = None) -> bool:
         """判断是否为媒体服务"""
         category = self.get_service_category(ip, domain)
-        return category in ['video', 'streaming', 'media'] if category else False
+        return category in {'video', 'streaming', 'media'} if category else False
     
     def get_statistics(self) -> Dict[str, int]:
         """获取识别器统计信息"""
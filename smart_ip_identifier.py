@@ -108,6 +108,10 @@ class SmartIPIdentifier:
                 ]
             }
         }
+        
+        # 预编译IP正则，匹配时不再经过re模块的缓存查找
+        self._compiled_ip_patterns = {provider: [re.compile(pattern) for pattern in config['ip_patterns']]
+                                      for provider, config in self.known_providers.items()}
     
     def _load_cache(self) -> Dict:
         """加载缓存的IP识别结果"""
@@ -136,18 +140,17 @@ class SmartIPIdentifier:
         # 先检查优先级列表中的服务
         for provider in provider_order:
             if provider in self.known_providers:
-                config = self.known_providers[provider]
-                for pattern in config['ip_patterns']:
-                    if re.match(pattern, ip):
+                for pattern in self._compiled_ip_patterns[provider]:
+                    if pattern.match(ip):
                         # YouTube获得更高的置信度
                         confidence = 0.95 if provider == 'youtube' else 0.9
                         return provider, confidence
         
         # 再检查其他服务
-        for provider, config in self.known_providers.items():
+        for provider, patterns in self._compiled_ip_patterns.items():
             if provider not in provider_order:
-                for pattern in config['ip_patterns']:
-                    if re.match(pattern, ip):
+                for pattern in patterns:
+                    if pattern.match(ip):
                         confidence = 0.9
                         return provider, confidence
         return None
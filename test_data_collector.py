@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据收集器单元测试
+测试 pcblist_n 二进制记录解析、netstat 地址拆分与接口统计解析
+"""
+
+import socket
+import struct
+import subprocess
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+from data_collector import (
+    DarwinDataCollector, _split_ipport, _parse_tcp_pcblist_n, _parse_netstat_ib,
+    _XSO_SOCKET, _XSO_RCVBUF, _XSO_SNDBUF, _XSO_STATS, _XSO_INPCB, _XSO_TCPCB,
+    _XINPGEN_SIZE, _TCPS_ESTABLISHED, _INP_IPV4,
+    _INP_FPORT_OFFSET, _INP_VFLAG_OFFSET, _INP_FADDR4_OFFSET, _INP_LADDR4_OFFSET,
+    _TCP_STATE_OFFSET,
+)
+
+# 故意不是8的倍数，覆盖 ROUNDUP64 对齐逻辑
+_RECORD_LEN = 100
+_TCPS_SYN_SENT = 2
+_INP_IPV6 = 0x2
+
+
+def _xinpgen() -> bytes:
+    """构造首尾的 xinpgen 记录"""
+    return struct.pack('=II', _XINPGEN_SIZE, 0).ljust(_XINPGEN_SIZE, b'\0')
+
+
+def _record(kind: int) -> bytearray:
+    """构造一段按8字节对齐的空记录"""
+    rec = bytearray(((_RECORD_LEN - 1) | 7) + 1)
+    struct.pack_into('=II', rec, 0, _RECORD_LEN, kind)
+    return rec
+
+
+def _connection(local, foreign, state=_TCPS_ESTABLISHED, vflag=_INP_IPV4) -> bytes:
+    """构造一个连接的 socket/rcvbuf/sndbuf/stats/inpcb/tcpcb 六段记录"""
+    inp = _record(_XSO_INPCB)
+    struct.pack_into('!HH', inp, _INP_FPORT_OFFSET, foreign[1], local[1])
+    inp[_INP_VFLAG_OFFSET] = vflag
+    inp[_INP_FADDR4_OFFSET:_INP_FADDR4_OFFSET + 4] = socket.inet_aton(foreign[0])
+    inp[_INP_LADDR4_OFFSET:_INP_LADDR4_OFFSET + 4] = socket.inet_aton(local[0])
+
+    tcp = _record(_XSO_TCPCB)
+    struct.pack_into('=i', tcp, _TCP_STATE_OFFSET, state)
+
+    parts = [_record(kind) for kind in (_XSO_SOCKET, _XSO_RCVBUF, _XSO_SNDBUF, _XSO_STATS)]
+    return b''.join(bytes(p) for p in parts + [inp, tcp])
+
+
+class TestParseTcpPcblistN(unittest.TestCase):
+    """pcblist_n 解析测试类"""
+
+    def test_only_established_ipv4(self):
+        """只返回 ESTABLISHED 状态的IPv4连接"""
+        buf = b''.join([
+            _xinpgen(),
+            _connection(('192.168.1.10', 50000), ('93.184.216.34', 443)),
+            _connection(('192.168.1.10', 50001), ('1.1.1.1', 443), state=_TCPS_SYN_SENT),
+            _connection(('192.168.1.10', 50002), ('8.8.8.8', 53), vflag=_INP_IPV6),
+            _xinpgen(),
+        ])
+
+        self.assertEqual(_parse_tcp_pcblist_n(buf), [{
+            'local_ip': '192.168.1.10',
+            'local_port': '50000',
+            'foreign_ip': '93.184.216.34',
+            'foreign_port': '443',
+            'protocol': 'tcp'
+        }])
+
+    def test_truncated_buffer(self):
+        """过短或被截断的缓冲区不应抛异常"""
+        self.assertEqual(_parse_tcp_pcblist_n(b''), [])
+        conn = _connection(('10.0.0.2', 40000), ('1.2.3.4', 80))
+        self.assertEqual(_parse_tcp_pcblist_n(_xinpgen() + conn[:-8]), [])
+
+
+class TestSplitIpport(unittest.TestCase):
+    """netstat 地址拆分测试类"""
+
+    def test_ipv4(self):
+        """IPv4 地址按最后一个点拆分端口"""
+        self.assertEqual(_split_ipport('192.168.1.2.443'), ('192.168.1.2', '443'))
+
+    def test_ipv6_with_dotted_port(self):
+        """IPv6 地址即使带 .PORT 后缀也应被拒绝"""
+        self.assertIsNone(_split_ipport('fe80::1%en0.443'))
+        self.assertIsNone(_split_ipport('2001:db8::1.8080'))
+
+    def test_wildcard(self):
+        """监听套接字的 *.* 不是有效地址"""
+        self.assertIsNone(_split_ipport('*.*'))
+        self.assertIsNone(_split_ipport('*.443'))
+
+
+class TestParseNetstatIb(unittest.TestCase):
+    """netstat -ib 接口统计解析测试类"""
+
+    OUTPUT = (
+        "Name       Mtu   Network       Address            Ipkts Ierrs     Ibytes    Opkts Oerrs     Obytes  Coll\n"
+        "lo0        16384 <Link#1>                        1089397     0  234567890  1089397     0  234567890     0\n"
+        "lo0        16384 127           localhost         1089397     -  234567890  1089397     -  234567890     -\n"
+        "gif0*      1280  <Link#2>                              0     0          0        0     0          0     0\n"
+        "en0        1500  <Link#4>      3c:22:fb:aa:bb:cc 12345678     0 9876543210  8765432     0 1234567890     0\n"
+        "en0        1500  192.168.31    192.168.31.31     12345678     - 9876543210  8765432     - 1234567890     -\n"
+        "en0        1500  fe80::1%en0   fe80:4::1c2a:1    12345678     - 9876543210  8765432     - 1234567890     -\n"
+        "utun3      1380  <Link#15>                         55555     0    6666666    44444     0    3333333     0\n"
+        "utun3      1380  28.0.0/30     28.0.0.1            55555     -    6666666    44444     -    3333333     -\n"
+    )
+
+    def test_link_rows(self):
+        """每个接口只取 <Link#N> 行，无MAC地址的接口列不错位，排除回环接口"""
+        self.assertEqual(_parse_netstat_ib(self.OUTPUT), {
+            'gif0*': {'bytes_in': 0, 'bytes_out': 0},
+            'en0': {'bytes_in': 9876543210, 'bytes_out': 1234567890},
+            'utun3': {'bytes_in': 6666666, 'bytes_out': 3333333},
+        })
+
+    def test_empty_output(self):
+        """空输出或只有表头时返回空字典"""
+        self.assertEqual(_parse_netstat_ib(''), {})
+        self.assertEqual(_parse_netstat_ib(self.OUTPUT.split('\n')[0]), {})
+
+
+class _FakeUdpSocket:
+    """只实现 detect_local_network 用到的方法的UDP套接字"""
+
+    def __init__(self, local_ip=None):
+        self.local_ip = local_ip
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def connect(self, address):
+        if self.local_ip is None:
+            raise OSError(101, 'Network is unreachable')
+
+    def getsockname(self):
+        return self.local_ip, 54321
+
+
+class TestDetectLocalNetwork(unittest.TestCase):
+    """本地网络段检测测试类"""
+
+    ROUTE_OUTPUT = "   route to: default\ndestination: default\n    gateway: 10.0.0.1\n  interface: en0\n"
+
+    def _detect(self, local_ip=None, route_stdout=None):
+        """替换套接字和 route 命令后检测，返回 (网段, route 是否被调用)"""
+        def fake_run(*args, **kwargs):
+            if route_stdout is None:
+                raise OSError(2, 'No such file or directory')
+            return subprocess.CompletedProcess(args[0], 0, stdout=route_stdout, stderr='')
+
+        with mock.patch('data_collector.socket.socket', lambda *args: _FakeUdpSocket(local_ip)), \
+                mock.patch('data_collector.subprocess.run', side_effect=fake_run) as run, \
+                redirect_stdout(StringIO()):
+            return DarwinDataCollector().detect_local_network(), run.called
+
+    def test_default_route_address(self):
+        """取默认路由出口地址所在的 /24 网段，不启动子进程"""
+        self.assertEqual(self._detect('192.168.31.31'), ('192.168.31.0/24', False))
+
+    def test_falls_back_to_route(self):
+        """无默认路由时回退到 route 命令的网关地址"""
+        self.assertEqual(self._detect(route_stdout=self.ROUTE_OUTPUT), ('10.0.0.0/24', True))
+        self.assertEqual(self._detect('0.0.0.0', self.ROUTE_OUTPUT), ('10.0.0.0/24', True))
+
+    def test_default_network(self):
+        """两种方式都失败时返回默认网段"""
+        self.assertEqual(self._detect(), ('192.168.1.0/24', True))
+
+
+def run_data_collector_tests():
+    """运行所有数据收集器测试"""
+    print("🧪 运行数据收集器单元测试")
+    print("=" * 50)
+
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+
+    # 添加所有测试类
+    test_classes = [
+        TestParseTcpPcblistN,
+        TestSplitIpport,
+        TestParseNetstatIb,
+        TestDetectLocalNetwork
+    ]
+
+    for test_class in test_classes:
+        tests = loader.loadTestsFromTestCase(test_class)
+        suite.addTests(tests)
+
+    # 运行测试
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+
+    # 输出结果总结
+    print(f"\n📊 测试总结:")
+    print(f"   运行测试: {result.testsRun}")
+    print(f"   成功: {result.testsRun - len(result.failures) - len(result.errors)}")
+    print(f"   失败: {len(result.failures)}")
+    print(f"   错误: {len(result.errors)}")
+
+    success = len(result.failures) == 0 and len(result.errors) == 0
+    print(f"\n{'✅ 所有测试通过!' if success else '❌ 存在测试失败!'}")
+
+    return success
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+域名解析器单元测试
+测试批量反向查询的并发、超时和缓存行为
+"""
+
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+from domain_resolver import EnhancedDomainResolver
+from geosite_loader import geosite_loader
+
+# 公网地址（文档保留网段会被视为私有地址而跳过查询）
+_PUBLIC_IPS = ['93.184.216.1', '93.184.216.2', '93.184.216.3', '93.184.216.4', '93.184.216.5']
+
+
+class TestEnhancedDomainResolver(unittest.TestCase):
+    """域名解析器测试类"""
+
+    def setUp(self):
+        """测试前准备：替换DNS反查和GeoSite查询，记录每次PTR查询"""
+        self.resolver = EnhancedDomainResolver()
+        self.addCleanup(self.resolver.close)
+
+        self.ptr_calls = []
+        self.ptr_delay = 0
+        self.hostnames = {}      # {ip: 反查得到的主机名}，不在其中的IP反查失败
+        self.ip_services = {}    # {ip: GeoSite IP数据中的服务}
+        self.release = threading.Event()  # 设置 ptr_delay=None 时，查询阻塞到该事件被触发
+        self.addCleanup(self.release.set)
+
+        for patcher in (
+            mock.patch('socket.gethostbyaddr', self._fake_gethostbyaddr),
+            mock.patch.object(geosite_loader, 'get_ip_service', self.ip_services.get),
+            mock.patch.object(geosite_loader, 'get_domain_category', lambda domain: None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _fake_gethostbyaddr(self, ip):
+        self.ptr_calls.append(ip)
+        if self.ptr_delay is None:
+            self.release.wait()
+        else:
+            time.sleep(self.ptr_delay)
+        if ip not in self.hostnames:
+            raise socket.herror(1, 'Unknown host')
+        return self.hostnames[ip], [], [ip]
+
+    def test_batch_lookups_run_concurrently(self):
+        """一批新IP的反向查询并发执行，总耗时接近单次查询而不是累加"""
+        self.ptr_delay = 0.3
+        self.hostnames = {ip: f'host-{i}.example.net' for i, ip in enumerate(_PUBLIC_IPS)}
+
+        start = time.monotonic()
+        results = self.resolver.resolve_many(_PUBLIC_IPS)
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.3 * 2)
+        self.assertEqual(results, {ip: 'example.net' for ip in _PUBLIC_IPS})
+
+    def test_one_ptr_query_per_ip(self):
+        """每个IP只发出一次PTR查询，主机名关键词直接识别为服务"""
+        ip = _PUBLIC_IPS[0]
+        self.hostnames = {ip: 'server-1-2-3-4.nrt12.r.cloudfront.net'}
+
+        results = self.resolver.resolve_many([ip, ip, ip])
+
+        self.assertEqual(results, {ip: 'cloudfront.com'})
+        self.assertEqual(self.ptr_calls, [ip])
+
+    def test_ip_range_hit_and_private_ip_skip_ptr(self):
+        """IP范围命中和私有地址都不发出PTR查询"""
+        self.ip_services['149.154.167.1'] = 'telegram'
+
+        results = self.resolver.resolve_many(['149.154.167.1', '192.168.1.5', '127.0.0.1'])
+
+        self.assertEqual(results, {
+            '149.154.167.1': 'telegram.com',
+            '192.168.1.5': '192.168.1.5(未知网站)',
+            '127.0.0.1': '127.0.0.1(未知网站)',
+        })
+        self.assertEqual(self.ptr_calls, [])
+
+    def test_timed_out_lookup_is_not_waited_on_again(self):
+        """超时的查询不写缓存，之后的解析不再等待它，完成后返回真实域名"""
+        ip = _PUBLIC_IPS[0]
+        self.ptr_delay = None
+        self.hostnames = {ip: 'edge-1.example.org'}
+
+        start = time.monotonic()
+        self.assertEqual(self.resolver.resolve_domain(ip), f'{ip}(未知网站)')
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+
+        start = time.monotonic()
+        for _ in range(5):
+            self.assertEqual(self.resolver.resolve_domain(ip), f'{ip}(未知网站)')
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(self.ptr_calls, [ip])
+
+        self.release.set()
+        self.resolver._inflight_lookups[ip].result(timeout=1)
+        self.assertEqual(self.resolver.resolve_domain(ip), 'example.org')
+        self.assertEqual(self.ptr_calls, [ip])
+
+    def test_failed_lookup_falls_back_and_is_cached(self):
+        """反查失败时返回兜底名称并缓存，不会重复查询"""
+        ip = _PUBLIC_IPS[0]
+
+        self.assertEqual(self.resolver.resolve_domain(ip), f'{ip}(未知网站)')
+        self.assertEqual(self.resolver.resolve_domain(ip), f'{ip}(未知网站)')
+        self.assertEqual(self.ptr_calls, [ip])
+
+    def test_resolve_after_close_returns_fallback(self):
+        """关闭后不再提交查询也不抛异常，IP范围命中仍然有效"""
+        self.ip_services['149.154.167.1'] = 'telegram'
+        self.resolver.close()
+
+        results = self.resolver.resolve_many([_PUBLIC_IPS[0], '149.154.167.1'])
+
+        self.assertEqual(results, {
+            _PUBLIC_IPS[0]: f'{_PUBLIC_IPS[0]}(未知网站)',
+            '149.154.167.1': 'telegram.com',
+        })
+        self.assertEqual(self.ptr_calls, [])
+
+
+def run_domain_resolver_tests():
+    """运行所有域名解析器测试"""
+    print("🧪 运行域名解析器单元测试")
+    print("=" * 50)
+
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+
+    # 添加所有测试类
+    test_classes = [
+        TestEnhancedDomainResolver
+    ]
+
+    for test_class in test_classes:
+        tests = loader.loadTestsFromTestCase(test_class)
+        suite.addTests(tests)
+
+    # 运行测试
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+
+    # 输出结果总结
+    print(f"\n📊 测试总结:")
+    print(f"   运行测试: {result.testsRun}")
+    print(f"   成功: {result.testsRun - len(result.failures) - len(result.errors)}")
+    print(f"   失败: {len(result.failures)}")
+    print(f"   错误: {len(result.errors)}")
+
+    success = len(result.failures) == 0 and len(result.errors) == 0
+    print(f"\n{'✅ 所有测试通过!' if success else '❌ 存在测试失败!'}")
+
+    return success
+
+
+if __name__ == "__main__":
+    unittest.main()
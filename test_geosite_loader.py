@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GeoSite 数据加载器单元测试
+测试IPv4区间表、域名后缀树和keyword/regexp预筛选的构建与查找，
+解析缓存的权限检查、条件下载和IP信息查询
+"""
+
+import contextlib
+import io
+import ipaddress
+import os
+import random
+import re
+import tempfile
+import unittest
+import urllib.error
+from email.message import Message
+from unittest import mock
+
+from geosite_loader import (
+    GeositeLoader, _cidrs_to_ranges, _build_interval_table, _lookup_interval, _compile_pattern_filter,
+)
+from v2ray_dat_parser import DomainRule, GeositeEntry
+
+
+def _ip(address: str) -> int:
+    return int(ipaddress.IPv4Address(address))
+
+
+def _naive_lookup(labeled_ranges, value):
+    """逐个CIDR线性匹配，作为区间表的基准实现"""
+    for label, (starts, ends) in labeled_ranges:
+        for start, end in zip(starts, ends):
+            if start <= value <= end:
+                return label
+    return None
+
+
+def _make_loader(test: unittest.TestCase, rules=None, geoip=None, data_dir=None) -> GeositeLoader:
+    """通过真实构造函数在临时目录中创建加载器，跳过联网更新，再用给定规则构建查找结构
+
+    rules 为 {分类: [(规则类型, 值)]}，geoip 为 {国家/服务: [CIDR]}
+    """
+    if data_dir is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        test.addCleanup(tmpdir.cleanup)
+        data_dir = tmpdir.name
+    with mock.patch.object(GeositeLoader, '_should_update', return_value=False), \
+            contextlib.redirect_stdout(io.StringIO()):
+        loader = GeositeLoader(data_dir)
+        if rules is not None or geoip is not None:
+            loader.geoip_data = {name: _cidrs_to_ranges(cidrs) for name, cidrs in (geoip or {}).items()}
+            entries = {
+                category: GeositeEntry(category, [DomainRule(t, v) for t, v in category_rules], len(category_rules))
+                for category, category_rules in (rules or {}).items()
+            }
+            loader._build_lookup_cache(entries)
+    return loader
+
+
+class TestIntervalTable(unittest.TestCase):
+    """IPv4区间表测试类"""
+
+    def test_special_service_beats_country(self):
+        """嵌套/重叠区间中优先级高的特殊服务胜出"""
+        table = _build_interval_table([
+            ('telegram', _cidrs_to_ranges(['149.154.160.0/20'])),
+            ('gb', _cidrs_to_ranges(['149.154.0.0/16'])),
+            ('us', _cidrs_to_ranges(['149.154.164.0/22'])),
+        ])
+
+        self.assertEqual(_lookup_interval(table, _ip('149.154.1.1')), 'gb')
+        self.assertEqual(_lookup_interval(table, _ip('149.154.160.0')), 'telegram')
+        self.assertEqual(_lookup_interval(table, _ip('149.154.165.1')), 'telegram')
+        self.assertEqual(_lookup_interval(table, _ip('149.154.175.255')), 'telegram')
+        self.assertEqual(_lookup_interval(table, _ip('149.154.176.0')), 'gb')
+        self.assertEqual(_lookup_interval(table, _ip('149.154.255.255')), 'gb')
+
+    def test_adjacent_ranges(self):
+        """相邻区间在边界处各自生效，同标签相邻区间被合并"""
+        table = _build_interval_table([
+            ('a', _cidrs_to_ranges(['10.0.0.0/25', '10.0.1.0/24'])),
+            ('b', _cidrs_to_ranges(['10.0.0.128/25'])),
+            ('c', _cidrs_to_ranges(['10.0.2.0/24', '10.0.3.0/24'])),
+        ])
+
+        self.assertEqual(_lookup_interval(table, _ip('10.0.0.127')), 'a')
+        self.assertEqual(_lookup_interval(table, _ip('10.0.0.128')), 'b')
+        self.assertEqual(_lookup_interval(table, _ip('10.0.0.255')), 'b')
+        self.assertEqual(_lookup_interval(table, _ip('10.0.1.0')), 'a')
+        self.assertEqual(_lookup_interval(table, _ip('10.0.3.255')), 'c')
+        self.assertEqual(table[2].count('c'), 1)
+
+    def test_miss(self):
+        """不在任何区间内时返回None"""
+        table = _build_interval_table([('cn', _cidrs_to_ranges(['110.0.0.0/7']))])
+
+        self.assertIsNone(_lookup_interval(table, _ip('109.255.255.255')))
+        self.assertIsNone(_lookup_interval(table, _ip('112.0.0.0')))
+        self.assertIsNone(_lookup_interval(table, 0))
+        self.assertIsNone(_lookup_interval(_build_interval_table([]), _ip('1.1.1.1')))
+
+    def test_matches_naive_scan(self):
+        """随机重叠区间上与逐个CIDR线性匹配的结果一致"""
+        rng = random.Random(20240601)
+        labeled_ranges = []
+        for label in ('cloudflare', 'google', 'cn', 'us', 'jp'):
+            cidrs = []
+            for _ in range(40):
+                prefix = rng.randint(8, 28)
+                address = ipaddress.IPv4Address(rng.getrandbits(8) << 24 | rng.getrandbits(24))
+                cidrs.append(f'{address}/{prefix}')
+            labeled_ranges.append((label, _cidrs_to_ranges(cidrs)))
+        table = _build_interval_table(labeled_ranges)
+
+        probes = [rng.getrandbits(32) for _ in range(2000)]
+        for _, (starts, ends) in labeled_ranges:
+            for start, end in zip(starts, ends):
+                probes.extend((start - 1, start, end, end + 1))
+        for value in probes:
+            self.assertEqual(_lookup_interval(table, value), _naive_lookup(labeled_ranges, value), value)
+
+
+class TestSuffixTrie(unittest.TestCase):
+    """域名后缀树测试类"""
+
+    def test_subdomain_match(self):
+        """domain规则匹配自身及所有子域名，但不匹配同后缀的其他域名"""
+        loader = _make_loader(self, {'GOOGLE': [('domain', 'google.com')]})
+
+        self.assertEqual(loader.get_domain_category('google.com'), 'GOOGLE')
+        self.assertEqual(loader.get_domain_category('www.google.com'), 'GOOGLE')
+        self.assertEqual(loader.get_domain_category('A.B.Google.COM'), 'GOOGLE')
+        self.assertIsNone(loader.get_domain_category('notgoogle.com'))
+        self.assertIsNone(loader.get_domain_category('com'))
+
+    def test_full_exact_only(self):
+        """full规则只匹配完全相同的域名"""
+        loader = _make_loader(self, {'EXAMPLE': [('full', 'api.example.com')]})
+
+        self.assertEqual(loader.get_domain_category('api.example.com'), 'EXAMPLE')
+        self.assertIsNone(loader.get_domain_category('v1.api.example.com'))
+        self.assertIsNone(loader.get_domain_category('example.com'))
+
+    def test_parent_does_not_match_full_rule(self):
+        """父域名只命中自身的domain规则，不会命中子域名上的full规则"""
+        loader = _make_loader(self, {
+            'CATEGORY-DEV': [('domain', 'example.com')],
+            'EXAMPLE': [('full', 'api.example.com')],
+        })
+
+        self.assertEqual(loader.get_domain_category('example.com'), 'CATEGORY-DEV')
+        self.assertEqual(loader.get_domain_category('www.example.com'), 'CATEGORY-DEV')
+        self.assertEqual(loader.get_domain_category('api.example.com'), 'EXAMPLE')
+
+    def test_category_priority(self):
+        """多个规则同时命中时：知名服务 > 其他服务 > 地理位置/类别分类"""
+        loader = _make_loader(self, {
+            'GEOLOCATION-!CN': [('domain', 'youtube.com'), ('domain', 'foo.net')],
+            'CATEGORY-MEDIA': [('domain', 'youtube.com'), ('domain', 'bar.org')],
+            'GOOGLE': [('domain', 'youtube.com')],
+            'VIDEOSITE': [('domain', 'youtube.com'), ('domain', 'foo.net')],
+            'YOUTUBE': [('full', 'www.youtube.com')],
+        })
+
+        self.assertEqual(loader.get_domain_category('www.youtube.com'), 'YOUTUBE')
+        self.assertEqual(loader.get_domain_category('m.youtube.com'), 'GOOGLE')
+        self.assertEqual(loader.get_domain_category('foo.net'), 'VIDEOSITE')
+        self.assertEqual(loader.get_domain_category('bar.org'), 'CATEGORY-MEDIA')
+
+
+class TestPatternFilter(unittest.TestCase):
+    """keyword/regexp合并预筛选测试类"""
+
+    DOMAINS = ['ab.com', 'xx.com', 'xy.com', 'cdn.qq.com', 'img-ads.net', 'aa-aa.org', 'other.io']
+
+    def assertNeverDrops(self, pattern_rules):
+        """任意规则能匹配的域名，预筛选都必须命中"""
+        pattern_filter = _compile_pattern_filter(pattern_rules)
+        for domain in self.DOMAINS:
+            matched = any(pattern in domain if rule_type == 'keyword' else pattern.search(domain)
+                          for _, rule_type, pattern in pattern_rules)
+            if matched:
+                self.assertIsNotNone(pattern_filter, domain)
+                self.assertTrue(pattern_filter.search(domain), domain)
+
+    def test_plain_patterns(self):
+        """普通keyword/regexp规则合并后不丢失匹配"""
+        self.assertNeverDrops([
+            (0, 'keyword', 'ads'),
+            (1, 'regexp', re.compile(r'(^|\.)qq\.com$')),
+            (2, 'regexp', re.compile(r'^(a)b')),
+        ])
+
+    def test_backreference_patterns(self):
+        """含反向引用的正则合并后组号错位，预筛选不能因此丢失匹配"""
+        self.assertNeverDrops([
+            (0, 'regexp', re.compile(r'^(a)b')),
+            (1, 'regexp', re.compile(r'^(x)\1')),
+            (2, 'regexp', re.compile(r'(?P<w>a+)-(?P=w)')),
+        ])
+
+    def test_loader_matches_backreference_rule(self):
+        """含反向引用的regexp规则在完整查找中仍能命中"""
+        loader = _make_loader(self, {
+            'FIRST': [('regexp', r'^(a)b')],
+            'DOUBLE': [('regexp', r'^(x)\1')],
+        })
+
+        self.assertEqual(loader.get_domain_category('xx.com'), 'DOUBLE')
+        self.assertEqual(loader.get_domain_category('ab.com'), 'FIRST')
+        self.assertIsNone(loader.get_domain_category('xy.com'))
+
+
+class _FakeResponse(io.BytesIO):
+    """urlopen 返回的响应：可分块读取的内容加响应头"""
+
+    def __init__(self, body: bytes, headers: Message):
+        super().__init__(body)
+        self.headers = headers
+
+
+class TestParsedCache(unittest.TestCase):
+    """解析结果磁盘缓存测试类"""
+
+    def setUp(self):
+        """测试前准备：在临时目录中写入一份解析缓存"""
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.data_dir = tmpdir.name
+        loader = _make_loader(self, {'GOOGLE': [('domain', 'google.com')]}, data_dir=self.data_dir)
+        loader._save_parsed_cache(loader._source_signature())
+        self.cache_path = loader.cache_path
+
+    def test_cache_is_owner_only(self):
+        """缓存文件只允许当前用户读写"""
+        self.assertEqual(os.stat(self.cache_path).st_mode & 0o777, 0o600)
+
+    def test_reload_from_cache(self):
+        """数据文件未变化时直接从缓存恢复查找结构"""
+        loader = _make_loader(self, data_dir=self.data_dir)
+
+        self.assertEqual(loader.get_domain_category('www.google.com'), 'GOOGLE')
+
+    def test_group_or_world_writable_cache_ignored(self):
+        """组或其他用户可写的缓存文件不被反序列化"""
+        for mode in (0o620, 0o602):
+            os.chmod(self.cache_path, mode)
+            with mock.patch('pickle.load') as pickle_load:
+                loader = _make_loader(self, data_dir=self.data_dir)
+
+            pickle_load.assert_not_called()
+            self.assertIsNone(loader.get_domain_category('www.google.com'), oct(mode))
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), "需要POSIX用户ID")
+    def test_other_owner_cache_ignored(self):
+        """其他用户拥有的缓存文件不被反序列化"""
+        with mock.patch('os.getuid', return_value=os.getuid() + 1), mock.patch('pickle.load') as pickle_load:
+            loader = _make_loader(self, data_dir=self.data_dir)
+
+        pickle_load.assert_not_called()
+        self.assertIsNone(loader.get_domain_category('www.google.com'))
+
+
+class TestDownloadFile(unittest.TestCase):
+    """数据文件条件下载测试类"""
+
+    URL = 'https://example.com/geosite.dat'
+
+    def setUp(self):
+        """测试前准备：创建加载器，替换 urlopen 并记录请求"""
+        self.loader = _make_loader(self)
+        self.filepath = os.path.join(self.loader.data_dir, 'geosite.dat')
+        self.requests = []
+        self.response = None  # urlopen 的返回值，为异常时抛出
+
+        patcher = mock.patch('urllib.request.urlopen', self._fake_urlopen)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fake_urlopen(self, request, timeout=None):
+        self.requests.append(request)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+    def _download(self) -> bool:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.loader._download_file(self.URL, 'geosite.dat')
+
+    def _write_existing(self, content: bytes, etag: str, last_modified: str):
+        """模拟上次下载的文件及其校验信息"""
+        with open(self.filepath, 'wb') as f:
+            f.write(content)
+        self.loader._save_download_meta({'geosite.dat': {'etag': etag, 'last_modified': last_modified}})
+
+    def _http_error(self, code: int) -> urllib.error.HTTPError:
+        return urllib.error.HTTPError(self.URL, code, 'error', Message(), io.BytesIO())
+
+    def test_not_modified_keeps_file(self):
+        """已有文件时带上 If-None-Match / If-Modified-Since，304 时保留原文件"""
+        self._write_existing(b'old', '"abc"', 'Wed, 01 Jan 2025 00:00:00 GMT')
+        self.response = self._http_error(304)
+
+        self.assertTrue(self._download())
+
+        request = self.requests[0]
+        self.assertEqual(request.get_header('If-none-match'), '"abc"')
+        self.assertEqual(request.get_header('If-modified-since'), 'Wed, 01 Jan 2025 00:00:00 GMT')
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), b'old')
+        self.assertFalse(os.path.exists(self.filepath + '.tmp'))
+
+    def test_download_saves_validators(self):
+        """下载成功时写入文件并保存新的 ETag / Last-Modified"""
+        self._write_existing(b'old', '"abc"', 'Wed, 01 Jan 2025 00:00:00 GMT')
+        headers = Message()
+        headers['ETag'] = '"def"'
+        headers['Last-Modified'] = 'Thu, 02 Jan 2025 00:00:00 GMT'
+        self.response = _FakeResponse(b'new' * 100000, headers)
+
+        self.assertTrue(self._download())
+
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), b'new' * 100000)
+        self.assertEqual(self.loader._load_download_meta()['geosite.dat'],
+                         {'etag': '"def"', 'last_modified': 'Thu, 02 Jan 2025 00:00:00 GMT'})
+
+    def test_missing_file_is_not_conditional(self):
+        """本地文件不存在时即使有校验信息也不发送条件请求头"""
+        self._write_existing(b'old', '"abc"', 'Wed, 01 Jan 2025 00:00:00 GMT')
+        os.remove(self.filepath)
+        self.response = _FakeResponse(b'data', Message())
+
+        self.assertTrue(self._download())
+
+        self.assertFalse(self.requests[0].has_header('If-none-match'))
+        self.assertFalse(self.requests[0].has_header('If-modified-since'))
+
+    def test_http_error_keeps_file(self):
+        """其他HTTP错误返回False，原文件不变且不留临时文件"""
+        self._write_existing(b'old', '"abc"', '')
+        self.response = self._http_error(500)
+
+        self.assertFalse(self._download())
+
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), b'old')
+        self.assertFalse(os.path.exists(self.filepath + '.tmp'))
+
+
+class TestGetIpInfo(unittest.TestCase):
+    """IP国家/服务联合查询测试类"""
+
+    def setUp(self):
+        """测试前准备：构建包含特殊服务和国家的区间表"""
+        self.loader = _make_loader(self, geoip={
+            'TELEGRAM': ['149.154.160.0/20'],
+            'GB': ['149.154.0.0/16'],
+            'US': ['93.184.0.0/16'],
+        })
+
+    def test_service_and_country(self):
+        """特殊服务同时作为国家/地区和服务返回，普通国家只返回国家/地区"""
+        self.assertEqual(self.loader.get_ip_info('149.154.167.1'), ('telegram', 'telegram'))
+        self.assertEqual(self.loader.get_ip_info('149.154.1.1'), ('gb', None))
+        self.assertEqual(self.loader.get_ip_info('93.184.216.34'), ('us', None))
+
+    def test_matches_separate_queries(self):
+        """与分别查询国家/地区和服务的结果一致"""
+        for ip in ('149.154.167.1', '149.154.1.1', '93.184.216.34', '203.0.113.1'):
+            self.assertEqual(self.loader.get_ip_info(ip),
+                             (self.loader.get_ip_country(ip), self.loader.get_ip_service(ip)), ip)
+
+    def test_invalid_ip(self):
+        """非法地址返回 (None, None)"""
+        for ip in ('', 'not-an-ip', '300.1.1.1'):
+            self.assertEqual(self.loader.get_ip_info(ip), (None, None), ip)
+
+    def test_cache_cleared_on_rebuild(self):
+        """查询结果被缓存，重建查找结构后缓存失效"""
+        self.loader.get_ip_info('93.184.216.34')
+        self.loader.get_ip_info('93.184.216.34')
+        self.assertEqual(self.loader._ip_info_cache.cache_info().hits, 1)
+
+        self.loader.geoip_data = {'JP': _cidrs_to_ranges(['93.184.0.0/16'])}
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.loader._build_lookup_cache({})
+
+        self.assertEqual(self.loader.get_ip_info('93.184.216.34'), ('jp', None))
+
+
+def run_geosite_loader_tests():
+    """运行所有GeoSite数据加载器测试"""
+    print("🧪 运行GeoSite数据加载器单元测试")
+    print("=" * 50)
+
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+
+    # 添加所有测试类
+    test_classes = [
+        TestIntervalTable,
+        TestSuffixTrie,
+        TestPatternFilter,
+        TestParsedCache,
+        TestDownloadFile,
+        TestGetIpInfo
+    ]
+
+    for test_class in test_classes:
+        tests = loader.loadTestsFromTestCase(test_class)
+        suite.addTests(tests)
+
+    # 运行测试
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+
+    # 输出结果总结
+    print(f"\n📊 测试总结:")
+    print(f"   运行测试: {result.testsRun}")
+    print(f"   成功: {result.testsRun - len(result.failures) - len(result.errors)}")
+    print(f"   失败: {len(result.failures)}")
+    print(f"   错误: {len(result.errors)}")
+
+    success = len(result.failures) == 0 and len(result.errors) == 0
+    print(f"\n{'✅ 所有测试通过!' if success else '❌ 存在测试失败!'}")
+
+    return success
+
+
+if __name__ == "__main__":
+    unittest.main()
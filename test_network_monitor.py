@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网络监控器单元测试
+测试最近连接的前缀计数与淘汰逻辑、特殊域名后缀映射
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
+
+from network_monitor import NetworkMonitor
+from utils import shutdown_executor
+
+_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+
+
+class _FakeDataCollector:
+    """不访问系统命令的数据收集器"""
+
+    def detect_local_network(self) -> str:
+        return '192.168.31.0/24'
+
+
+def _make_monitor(test: unittest.TestCase, max_recent_connections: int = 1000) -> NetworkMonitor:
+    """通过真实构造函数创建监控器：配置写入临时文件，数据收集器替换为假实现"""
+    with open(_CONFIG_FILE, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['monitoring']['max_recent_connections'] = max_recent_connections
+
+    tmpdir = tempfile.TemporaryDirectory()
+    test.addCleanup(tmpdir.cleanup)
+    config_file = os.path.join(tmpdir.name, 'config.json')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+
+    with mock.patch('network_monitor.create_data_collector', _FakeDataCollector):
+        monitor = NetworkMonitor(config_file)
+    # 不调用 stop()：它会关闭全局 domain_resolver，影响同一进程中的其他测试
+    test.addCleanup(shutdown_executor, monitor._hostname_pool)
+    return monitor
+
+
+class TestTrackRecentConnection(unittest.TestCase):
+    """最近连接跟踪测试类"""
+
+    def setUp(self):
+        """测试前准备：创建最近连接上限为3的监控器"""
+        self.monitor = _make_monitor(self, max_recent_connections=3)
+
+    def track(self, *ips):
+        for ip in ips:
+            self.monitor._track_recent_connection(ip)
+
+    def test_counts_keyed_by_slash16_prefix(self):
+        """计数按 ip>>16（/16前缀）归类，重复IP不重复计数"""
+        self.track('1.2.3.4', '1.2.200.1', '1.3.0.1', '1.2.3.4')
+
+        self.assertEqual(self.monitor._recent_prefix_counts, Counter({0x0102: 2, 0x0103: 1}))
+        self.assertEqual(self.monitor.recent_connections, {'1.2.3.4', '1.2.200.1', '1.3.0.1'})
+
+    def test_evicts_oldest_over_limit(self):
+        """超过 max_recent_connections 时淘汰最早加入的IP并扣减计数"""
+        self.track('1.2.3.4', '1.2.5.6', '8.8.8.8', '8.8.4.4')
+
+        self.assertEqual(self.monitor.recent_connections, {'1.2.5.6', '8.8.8.8', '8.8.4.4'})
+        self.assertEqual([ip for ip, _ in self.monitor._recent_connection_order],
+                         ['1.2.5.6', '8.8.8.8', '8.8.4.4'])
+        self.assertEqual(self.monitor._recent_prefix_counts, Counter({0x0102: 1, 0x0808: 2}))
+
+    def test_prefix_removed_when_count_reaches_zero(self):
+        """前缀计数扣减到0时删除该键，避免计数表无限增长"""
+        self.track('1.2.3.4', '8.8.8.8', '8.8.4.4', '9.9.9.9')
+
+        self.assertNotIn(0x0102, self.monitor._recent_prefix_counts)
+        self.assertEqual(self.monitor._recent_prefix_counts, Counter({0x0808: 2, 0x0909: 1}))
+
+    def test_non_ipv4_not_counted(self):
+        """非IPv4地址参与淘汰但不计入前缀计数"""
+        self.track('2001:db8::1', '1.2.3.4', '1.2.3.5', '1.2.3.6')
+
+        self.assertNotIn('2001:db8::1', self.monitor.recent_connections)
+        self.assertEqual(self.monitor._recent_prefix_counts, Counter({0x0102: 3}))
+
+
+class TestCheckSpecialDomainMappings(unittest.TestCase):
+    """特殊域名后缀映射测试类"""
+
+    def setUp(self):
+        """测试前准备：创建监控器"""
+        self.monitor = _make_monitor(self)
+
+    def test_exact_and_subdomain(self):
+        """映射键本身及其任意层级子域名都能命中"""
+        self.assertEqual(self.monitor._check_special_domain_mappings('qq.com'), ('腾讯/QQ', '中国'))
+        self.assertEqual(self.monitor._check_special_domain_mappings('r3---sn-abc.googlevideo.com'),
+                         ('YouTube', '海外'))
+        self.assertEqual(self.monitor._check_special_domain_mappings('a.b.c.fbcdn.net'), ('Facebook', '海外'))
+
+    def test_label_boundary(self):
+        """只按标签边界匹配，同后缀字符串或映射键出现在中间都不算命中"""
+        self.assertIsNone(self.monitor._check_special_domain_mappings('notqq.com'))
+        self.assertIsNone(self.monitor._check_special_domain_mappings('myyoutube.com'))
+        self.assertIsNone(self.monitor._check_special_domain_mappings('qq.com.example.net'))
+
+    def test_longest_suffix_wins(self):
+        """更具体的映射键优先于其父域名"""
+        self.assertEqual(self.monitor._check_special_domain_mappings('lh3.googleusercontent.com'),
+                         ('Google', '海外'))
+        self.assertEqual(self.monitor._check_special_domain_mappings('d1.cloudfront.net'), ('Amazon', '海外'))
+
+    def test_no_mapping(self):
+        """无映射及单标签域名返回None"""
+        self.assertIsNone(self.monitor._check_special_domain_mappings('example.org'))
+        self.assertIsNone(self.monitor._check_special_domain_mappings('localhost'))
+        self.assertIsNone(self.monitor._check_special_domain_mappings(''))
+
+
+def run_network_monitor_tests():
+    """运行所有网络监控器测试"""
+    print("🧪 运行网络监控器单元测试")
+    print("=" * 50)
+
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+
+    # 添加所有测试类
+    test_classes = [
+        TestTrackRecentConnection,
+        TestCheckSpecialDomainMappings
+    ]
+
+    for test_class in test_classes:
+        tests = loader.loadTestsFromTestCase(test_class)
+        suite.addTests(tests)
+
+    # 运行测试
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+
+    # 输出结果总结
+    print(f"\n📊 测试总结:")
+    print(f"   运行测试: {result.testsRun}")
+    print(f"   成功: {result.testsRun - len(result.failures) - len(result.errors)}")
+    print(f"   失败: {len(result.failures)}")
+    print(f"   错误: {len(result.errors)}")
+
+    success = len(result.failures) == 0 and len(result.errors) == 0
+    print(f"\n{'✅ 所有测试通过!' if success else '❌ 存在测试失败!'}")
+
+    return success
+
+
+if __name__ == "__main__":
+    unittest.main()
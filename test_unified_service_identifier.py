@@ -63,6 +63,15 @@ class TestUnifiedServiceIdentifier(unittest.TestCase):
         self.assertEqual(service.name, "niconico")
         self.assertEqual(service.category, "video")
     
+    def test_public_resolver_fast_path(self):
+        """测试公共DNS解析器快速路径与逐段匹配结果一致"""
+        fast_path = self.identifier._public_resolver_services
+        self.assertEqual(set(fast_path), {"8.8.8.8", "8.8.4.4", "1.1.1.1", "1.0.0.1"})
+        
+        self.identifier._public_resolver_services = {}
+        for ip, service in fast_path.items():
+            self.assertEqual(self.identifier.identify_service_by_ip(ip, use_dns=False), service)
+    
     def test_identify_service_by_domain(self):
         """测试基于域名的服务识别"""
         # Niconico
@@ -319,12 +328,12 @@ def run_unified_service_tests():
     if result.failures:
         print(f"\n❌ 失败的测试:")
         for test, traceback in result.failures:
-            print(f"   - {test}: {traceback.split('AssertionError: ')[-1].split('\\n')[0]}")
+            print(f"   - {test}: {traceback.split('AssertionError: ')[-1].splitlines()[0]}")
     
     if result.errors:
         print(f"\n💥 错误的测试:")
         for test, traceback in result.errors:
-            print(f"   - {test}: {traceback.split('\\n')[-2]}")
+            print(f"   - {test}: {traceback.splitlines()[-1]}")
     
     success = len(result.failures) == 0 and len(result.errors) == 0
     print(f"\n{'✅ 所有测试通过!' if success else '❌ 存在测试失败!'}")
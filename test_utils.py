@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通用工具函数单元测试
+测试IPv4网段解析与匹配、线程池关闭
+"""
+
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import parse_ipv4_networks, ip_in_networks, shutdown_executor
+
+
+class TestIpv4Networks(unittest.TestCase):
+    """IPv4网段解析与匹配测试类"""
+
+    def test_malformed_cidrs_are_skipped(self):
+        """非法CIDR被忽略，不影响其余条目"""
+        networks = parse_ipv4_networks([
+            '10.0.0.0/abc', '10.0.0.0/33', '10.0.0.0/-1', '300.1.1.1/8',
+            '10.0.0/8', 'fe80::/10', '', '/24', '192.168.0.0/16',
+        ])
+
+        self.assertEqual(networks, [(0xC0A80000, 0xFFFF0000)])
+        self.assertTrue(ip_in_networks('192.168.10.1', networks))
+        self.assertFalse(ip_in_networks('10.1.2.3', networks))
+
+    def test_host_bits_are_masked(self):
+        """网络地址中的主机位被清除"""
+        self.assertEqual(parse_ipv4_networks(['172.16.5.4/12']), [(0xAC100000, 0xFFF00000)])
+
+    def test_prefix_zero(self):
+        """/0 匹配所有IPv4地址"""
+        networks = parse_ipv4_networks(['1.2.3.4/0'])
+
+        self.assertEqual(networks, [(0, 0)])
+        self.assertTrue(ip_in_networks('0.0.0.0', networks))
+        self.assertTrue(ip_in_networks('255.255.255.255', networks))
+
+    def test_prefix_32(self):
+        """/32 及省略前缀只匹配单个地址"""
+        for cidr in ('8.8.8.8/32', '8.8.8.8'):
+            networks = parse_ipv4_networks([cidr])
+            self.assertEqual(networks, [(0x08080808, 0xFFFFFFFF)], cidr)
+            self.assertTrue(ip_in_networks('8.8.8.8', networks), cidr)
+            self.assertFalse(ip_in_networks('8.8.8.9', networks), cidr)
+            self.assertFalse(ip_in_networks('8.8.8.7', networks), cidr)
+
+    def test_non_ipv4_input_returns_false(self):
+        """非IPv4输入一律返回False，即使网段为 /0"""
+        networks = parse_ipv4_networks(['0.0.0.0/0'])
+        for ip in ('::1', '::ffff:10.0.0.1', 'fe80::1%en0', 'example.com', '', '10.0.0', '10.0.0.1.5', '256.0.0.1'):
+            self.assertFalse(ip_in_networks(ip, networks), ip)
+
+    def test_empty_networks(self):
+        """空网段列表不匹配任何地址"""
+        self.assertFalse(ip_in_networks('10.0.0.1', []))
+        self.assertEqual(parse_ipv4_networks([]), [])
+
+
+class TestShutdownExecutor(unittest.TestCase):
+    """线程池关闭测试类"""
+
+    def test_does_not_wait_and_rejects_new_tasks(self):
+        """关闭时不等待运行中的任务，之后提交新任务会失败"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        executor = ThreadPoolExecutor(max_workers=1)
+        running = executor.submit(release.wait)
+        queued = executor.submit(lambda: None)
+
+        shutdown_executor(executor)
+
+        self.assertFalse(running.done())
+        if sys.version_info >= (3, 9):
+            self.assertTrue(queued.cancelled())
+        with self.assertRaises(RuntimeError):
+            executor.submit(lambda: None)
+
+
+def run_utils_tests():
+    """运行所有通用工具函数测试"""
+    print("🧪 运行通用工具函数单元测试")
+    print("=" * 50)
+
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+
+    # 添加所有测试类
+    test_classes = [
+        TestIpv4Networks,
+        TestShutdownExecutor
+    ]
+
+    for test_class in test_classes:
+        tests = loader.loadTestsFromTestCase(test_class)
+        suite.addTests(tests)
+
+    # 运行测试
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+
+    # 输出结果总结
+    print(f"\n📊 测试总结:")
+    print(f"   运行测试: {result.testsRun}")
+    print(f"   成功: {result.testsRun - len(result.failures) - len(result.errors)}")
+    print(f"   失败: {len(result.failures)}")
+    print(f"   错误: {len(result.errors)}")
+
+    success = len(result.failures) == 0 and len(result.errors) == 0
+    print(f"\n{'✅ 所有测试通过!' if success else '❌ 存在测试失败!'}")
+
+    return success
+
+
+if __name__ == "__main__":
+    unittest.main()
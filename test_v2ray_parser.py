@@ -243,12 +243,12 @@ def run_parser_tests():
     if result.failures:
         print(f"\n❌ 失败的测试:")
         for test, traceback in result.failures:
-            print(f"   - {test}: {traceback.split('AssertionError: ')[-1].split('\\n')[0]}")
+            print(f"   - {test}: {traceback.split('AssertionError: ')[-1].splitlines()[0]}")
     
     if result.errors:
         print(f"\n💥 错误的测试:")
         for test, traceback in result.errors:
-            print(f"   - {test}: {traceback.split('\\n')[-2]}")
+            print(f"   - {test}: {traceback.splitlines()[-1]}")
     
     success = len(result.failures) == 0 and len(result.errors) == 0
     print(f"\n{'✅ 所有测试通过!' if success else '❌ 存在测试失败!'}")
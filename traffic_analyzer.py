@@ -16,10 +16,10 @@ from dataclasses import dataclass
 from domain_resolver import domain_resolver
 from geosite_loader import geosite_loader
 from unified_service_identifier import unified_service_identifier
-from utils import get_country_name
+from utils import get_country_name, parse_ipv4_networks, ip_in_networks, DATACLASS_SLOTS
 from performance_monitor import monitor_performance
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class ConnectionInfo:
     """连接信息数据类"""
     local_ip: str
@@ -63,6 +63,13 @@ class TrafficAnalyzer:
         self.config = config
         self.lock = threading.Lock()
         
+        # 代理/本地IP段只在初始化时解析一次
+        network_settings = config.get('network_settings', {})
+        self.proxy_prefixes = self._get_ip_prefixes('proxy_ip_ranges')  # 用于显示
+        self.local_prefixes = self._get_ip_prefixes('local_ip_ranges')
+        self.proxy_networks = parse_ipv4_networks(network_settings.get('proxy_ip_ranges', []))
+        self.local_networks = parse_ipv4_networks(network_settings.get('local_ip_ranges', []))
+        
         # 核心数据结构
         self.device_stats = {}  # 设备统计信息
         self.recent_connections = deque(maxlen=config.get('monitoring', {}).get('max_recent_connections', 1000))
@@ -165,9 +172,8 @@ class TrafficAnalyzer:
         """
         current_devices = set()
         
-        # 从配置读取IP范围前缀
-        proxy_prefixes = self._get_ip_prefixes('proxy_ip_ranges')
-        local_prefixes = self._get_ip_prefixes('local_ip_ranges')
+        proxy_prefixes = self.proxy_prefixes
+        local_prefixes = self.local_prefixes
         
         # 处理连接并识别设备
         vpn_connections = []
@@ -175,9 +181,10 @@ class TrafficAnalyzer:
         other_connections = []
         
         for conn in connections:
-            if any(conn.local_ip.startswith(prefix) for prefix in proxy_prefixes):
+            device_key = self._classify_local_ip(conn.local_ip)
+            if device_key == "Clash设备":
                 vpn_connections.append(conn)
-            elif any(conn.local_ip.startswith(prefix) for prefix in local_prefixes):
+            elif device_key == "直连设备":
                 local_connections.append(conn)
             else:
                 other_connections.append(conn)
@@ -202,6 +209,14 @@ class TrafficAnalyzer:
         
         return current_devices
     
+    def _classify_local_ip(self, local_ip: str) -> str:
+        """按配置的IP段归类本地IP：代理设备、直连设备或独立物理设备（返回IP本身）"""
+        if ip_in_networks(local_ip, self.proxy_networks):
+            return "Clash设备"
+        if ip_in_networks(local_ip, self.local_networks):
+            return "直连设备"
+        return local_ip
+    
     def _get_ip_prefixes(self, config_key: str) -> List[str]:
         """从配置获取IP前缀列表"""
         ip_ranges = self.config.get('network_settings', {}).get(config_key, [])
@@ -295,15 +310,7 @@ class TrafficAnalyzer:
         2. 检查是否属于直连设备（通过IP前缀）
         3. 其他情况作为独立物理设备处理
         """
-        proxy_prefixes = self._get_ip_prefixes('proxy_ip_ranges')
-        local_prefixes = self._get_ip_prefixes('local_ip_ranges')
-        
-        if any(conn.local_ip.startswith(prefix) for prefix in proxy_prefixes):
-            return "Clash设备"
-        elif any(conn.local_ip.startswith(prefix) for prefix in local_prefixes):
-            return "直连设备"
-        else:
-            return conn.local_ip
+        return self._classify_local_ip(conn.local_ip)
     
     @monitor_performance("identify_connection_target")
     def _identify_connection_target(self, conn: ConnectionInfo) -> Optional[str]:
@@ -368,7 +375,7 @@ class TrafficAnalyzer:
     def _format_country_name(self, country_code: str) -> str:
         """格式化国家名称显示"""
         # 统一服务识别器返回的服务名
-        if country_code in ['google', 'youtube', 'facebook', 'twitter', 'cloudflare']:
+        if country_code in {'google', 'youtube', 'facebook', 'twitter', 'cloudflare'}:
             return country_code.title()
         
         # 国家代码转换为中文名称
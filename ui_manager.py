@@ -7,6 +7,7 @@ UI管理器
 """
 
 import time
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 
@@ -28,6 +29,28 @@ from traffic_analyzer import TrafficAnalyzer, DeviceStats
 from performance_monitor import PerformanceMonitor, TableRenderCache
 from utils import get_country_name
 
+# 网站类型关键词表，按优先级顺序匹配
+_WEBSITE_TYPE_KEYWORDS = (
+    (('youtube', 'bilibili', 'niconico', 'netflix', 'video'), "🎬 视频"),
+    (('facebook', 'twitter', 'instagram', 'qq', 'wechat'), "👥 社交"),
+    (('google', 'baidu', 'bing'), "🔍 搜索"),
+    (('aws', 'cloudflare', 'azure', 'aliyun', '腾讯云'), "☁️ 云服务"),
+    (('amazon', 'taobao', 'tmall', 'jd'), "🛒 购物"),
+    (('news', '新闻', 'cnn', 'bbc'), "📰 新闻"),
+    (('steam', 'game', '游戏'), "🎮 游戏"),
+)
+
+
+@lru_cache(maxsize=1024)
+def _classify_website_name(website: str) -> str:
+    """按关键词表分类网站类型，网站名在每次刷新间重复出现，结果按名称缓存"""
+    website_lower = website.lower()
+    for keywords, website_type in _WEBSITE_TYPE_KEYWORDS:
+        for keyword in keywords:
+            if keyword in website_lower:
+                return website_type
+    return "🌐 网站"
+
 class UIManager:
     """
     UI管理器 - 专门负责界面渲染
@@ -310,38 +333,7 @@ class UIManager:
     
     def _classify_website(self, website: str) -> str:
         """分类网站类型"""
-        website_lower = website.lower()
-        
-        # 视频网站
-        if any(keyword in website_lower for keyword in ['youtube', 'bilibili', 'niconico', 'netflix', 'video']):
-            return "🎬 视频"
-        
-        # 社交网站
-        if any(keyword in website_lower for keyword in ['facebook', 'twitter', 'instagram', 'qq', 'wechat']):
-            return "👥 社交"
-        
-        # 搜索引擎
-        if any(keyword in website_lower for keyword in ['google', 'baidu', 'bing']):
-            return "🔍 搜索"
-        
-        # 云服务
-        if any(keyword in website_lower for keyword in ['aws', 'cloudflare', 'azure', 'aliyun', '腾讯云']):
-            return "☁️ 云服务"
-        
-        # 购物网站
-        if any(keyword in website_lower for keyword in ['amazon', 'taobao', 'tmall', 'jd']):
-            return "🛒 购物"
-        
-        # 新闻网站
-        if any(keyword in website_lower for keyword in ['news', '新闻', 'cnn', 'bbc']):
-            return "📰 新闻"
-        
-        # 游戏
-        if any(keyword in website_lower for keyword in ['steam', 'game', '游戏']):
-            return "🎮 游戏"
-        
-        # 默认
-        return "🌐 网站"
+        return _classify_website_name(website)
     
     def _create_footer_panel(self) -> Panel:
         """创建底部状态栏"""
@@ -16,8 +16,10 @@ import time
 import threading
 from typing import Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
-from utils import is_china_ip
+from utils import is_china_ip, ipv4_to_int, parse_ipv4_networks
 
+# 常见公共DNS解析器地址，几乎每台设备都会持续连接，构造时预先识别，查询时跳过逐段匹配
+_PUBLIC_RESOLVERS = frozenset({'8.8.8.8', '8.8.4.4', '1.1.1.1', '1.0.0.1', '9.9.9.9'})
 @dataclass
 class ServiceInfo:
     """服务信息"""
@@ -41,6 +43,24 @@ class UnifiedServiceIdentifier:
         self.domain_patterns = self._build_domain_patterns()
         self.legacy_providers = self._build_legacy_providers()
         
+        # IP段预解析为 (网络地址, 掩码, 服务) 整数表
+        self._ip_range_table = [(network, mask, info)
+                                for cidr, info in self.ip_range_database.items()
+                                for network, mask in parse_ipv4_networks([cidr])]
+        
+        # 预编译正则，匹配时不再经过re模块的缓存查找
+        self._compiled_domain_patterns = [(re.compile(pattern), info)
+                                          for pattern, info in self.domain_patterns.items()]
+        self._compiled_ip_patterns = {provider: [re.compile(pattern) for pattern in config['ip_patterns']]
+                                      for provider, config in self.legacy_providers.items()}
+        
+        # 公共DNS解析器的静态识别结果 {ip: ServiceInfo}，未识别出服务的地址不收录
+        self._public_resolver_services = {}
+        for ip in _PUBLIC_RESOLVERS:
+            service_info = self.identify_service_by_ip(ip, use_dns=False)
+            if service_info:
+                self._public_resolver_services[ip] = service_info
+        
     def _load_cache(self) -> Dict:
         """加载缓存的识别结果"""
         try:
@@ -258,18 +278,21 @@ class UnifiedServiceIdentifier:
             }
         }
     
-    def identify_service_by_ip(self, ip: str) -> Optional[ServiceInfo]:
-        """基于IP地址识别服务"""
+    def identify_service_by_ip(self, ip: str, use_dns: bool = True) -> Optional[ServiceInfo]:
+        """基于IP地址识别服务，use_dns为False时跳过可能阻塞数秒的DNS反查"""
+        service_info = self._public_resolver_services.get(ip)
+        if service_info:
+            return service_info
+        
         try:
-            ip_obj = ipaddress.ip_address(ip)
+            ipaddress.ip_address(ip)  # 校验地址格式
             
             # 1. 检查特定IP段数据库 (最高优先级)
-            for cidr, service_info in self.ip_range_database.items():
-                try:
-                    if ip_obj in ipaddress.ip_network(cidr, strict=False):
+            ip_value = ipv4_to_int(ip)
+            if ip_value >= 0:
+                for network, mask, service_info in self._ip_range_table:
+                    if ip_value & mask == network:
                         return service_info
-                except (ipaddress.AddressValueError, ValueError):
-                    continue
             
             # 2. 基于ASN的服务识别
             asn_result = self._identify_by_asn_heuristics(ip)
@@ -282,9 +305,10 @@ class UnifiedServiceIdentifier:
                 return legacy_result
             
             # 4. DNS反查识别
-            dns_result = self._dns_analysis(ip)
-            if dns_result:
-                return dns_result
+            if use_dns:
+                dns_result = self._dns_analysis(ip)
+                if dns_result:
+                    return dns_result
                 
             return None
             
@@ -298,8 +322,8 @@ class UnifiedServiceIdentifier:
             
         domain_lower = domain.lower()
         
-        for pattern, service_info in self.domain_patterns.items():
-            if re.match(pattern, domain_lower):
+        for pattern, service_info in self._compiled_domain_patterns:
+            if pattern.match(domain_lower):
                 return service_info
                 
         return None
@@ -319,7 +343,7 @@ class UnifiedServiceIdentifier:
         
         return None, None
     
-    def identify_ip(self, ip: str) -> Tuple[str, str, float]:
+    def identify_ip(self, ip: str, use_dns: bool = True) -> Tuple[str, str, float]:
         """
         兼容旧smart_ip_identifier接口的方法
         返回: (服务商, 地区, 置信度)
@@ -331,7 +355,7 @@ class UnifiedServiceIdentifier:
                 cached = self.cache[cache_key]
                 return cached['provider'], cached['region'], cached.get('confidence', 0.8)
         
-        service_info = self.identify_service_by_ip(ip)
+        service_info = self.identify_service_by_ip(ip, use_dns)
         
         if service_info:
             provider_name = service_info.display_name
@@ -343,6 +367,9 @@ class UnifiedServiceIdentifier:
                 provider_name, region, confidence = '中国网站', '中国', 0.3
             else:
                 provider_name, region, confidence = '海外网站', '海外', 0.3
+            if not use_dns:
+                # 跳过DNS时的兜底结果不写缓存，以免掩盖之后DNS反查能识别出的服务
+                return provider_name, region, confidence
         
         # 缓存结果
         with self.lock:
@@ -388,8 +415,8 @@ class UnifiedServiceIdentifier:
         for provider in provider_order:
             if provider in self.legacy_providers:
                 config = self.legacy_providers[provider]
-                for pattern in config['ip_patterns']:
-                    if re.match(pattern, ip):
+                for pattern in self._compiled_ip_patterns[provider]:
+                    if pattern.match(ip):
                         return config['service_info']
         
         return None
@@ -397,34 +424,39 @@ class UnifiedServiceIdentifier:
     def _dns_analysis(self, ip: str) -> Optional[ServiceInfo]:
         """通过DNS反查分析服务商"""
         try:
-            hostname = socket.gethostbyaddr(ip)[0].lower()
-            
-            # 检查已知关键词
-            keyword_mapping = {
-                'google': self.legacy_providers['google']['service_info'],
-                'youtube': self.legacy_providers['youtube']['service_info'],
-                'googlevideo': self.legacy_providers['youtube']['service_info'],
-                'amazon': self.legacy_providers['amazon']['service_info'],
-                'cloudfront': ServiceInfo("cloudfront", "Amazon CloudFront", "cdn", "us"),
-                'facebook': ServiceInfo("facebook", "Facebook", "social", "us"),
-                'alibaba': self.legacy_providers['alibaba']['service_info'],
-                'aliyun': self.legacy_providers['alibaba']['service_info'],
-                'tencent': self.legacy_providers['tencent']['service_info'],
-                'cloudflare': ServiceInfo("cloudflare", "Cloudflare", "cdn", "us"),
-                'apple': self.legacy_providers['apple']['service_info'],
-                'microsoft': self.legacy_providers['microsoft']['service_info'],
-                'nicovideo': ServiceInfo("niconico", "Niconico", "video", "jp"),
-                'dwango': ServiceInfo("dwango", "DWANGO", "video", "jp"),
-            }
-            
-            for keyword, service_info in keyword_mapping.items():
-                if keyword in hostname:
-                    return service_info
-                    
+            hostname = socket.gethostbyaddr(ip)[0]
         except (socket.herror, socket.gaierror, OSError):
-            pass
+            return None
         except Exception as e:
             print(f"DNS解析出现未知错误: {e}")
+            return None
+        return self.identify_service_by_hostname(hostname)
+    
+    def identify_service_by_hostname(self, hostname: str) -> Optional[ServiceInfo]:
+        """根据反向解析得到的主机名中的关键词识别服务商"""
+        hostname = hostname.lower()
+        
+        # 检查已知关键词
+        keyword_mapping = {
+            'google': self.legacy_providers['google']['service_info'],
+            'youtube': self.legacy_providers['youtube']['service_info'],
+            'googlevideo': self.legacy_providers['youtube']['service_info'],
+            'amazon': self.legacy_providers['amazon']['service_info'],
+            'cloudfront': ServiceInfo("cloudfront", "Amazon CloudFront", "cdn", "us"),
+            'facebook': ServiceInfo("facebook", "Facebook", "social", "us"),
+            'alibaba': self.legacy_providers['alibaba']['service_info'],
+            'aliyun': self.legacy_providers['alibaba']['service_info'],
+            'tencent': self.legacy_providers['tencent']['service_info'],
+            'cloudflare': ServiceInfo("cloudflare", "Cloudflare", "cdn", "us"),
+            'apple': self.legacy_providers['apple']['service_info'],
+            'microsoft': self.legacy_providers['microsoft']['service_info'],
+            'nicovideo': ServiceInfo("niconico", "Niconico", "video", "jp"),
+            'dwango': ServiceInfo("dwango", "DWANGO", "video", "jp"),
+        }
+        
+        for keyword, service_info in keyword_mapping.items():
+            if keyword in hostname:
+                return service_info
         
         return None
     
@@ -451,7 +483,7 @@ class UnifiedServiceIdentifier:
     def is_media_service(self, ip: str, domain: str = None) -> bool:
         """判断是否为媒体服务"""
         category = self.get_service_category(ip, domain)
-        return category in ['video', 'streaming', 'media'] if category else False
+        return category in {'video', 'streaming', 'media'} if category else False
     
     def get_statistics(self) -> Dict[str, int]:
         """获取识别器统计信息"""
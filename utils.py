@@ -4,6 +4,65 @@
 通用工具函数
 """
 
+import socket
+import struct
+import sys
+from concurrent.futures import Executor
+from typing import List, Tuple
+
+# IPv4地址的网络字节序打包格式
+_IPV4_STRUCT = struct.Struct('!I')
+
+# 大量创建的数据类使用 @dataclass(**DATACLASS_SLOTS)：Python 3.10+ 时启用 slots，实例不再携带 __dict__
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+def ipv4_to_int(ip: str) -> int:
+    """将点分十进制IPv4字符串转换为整数，非IPv4地址返回-1"""
+    try:
+        return _IPV4_STRUCT.unpack(socket.inet_pton(socket.AF_INET, ip))[0]
+    except OSError:
+        return -1
+
+
+def parse_ipv4_networks(cidrs: List[str]) -> List[Tuple[int, int]]:
+    """将CIDR字符串列表解析为 (网络地址, 掩码) 整数对，忽略非法条目"""
+    networks = []
+    for cidr in cidrs:
+        address, _, prefix = cidr.partition('/')
+        network = ipv4_to_int(address)
+        if network < 0:
+            continue
+        try:
+            prefix_len = int(prefix) if prefix else 32
+        except ValueError:
+            continue
+        if not 0 <= prefix_len <= 32:
+            continue
+        mask = (0xFFFFFFFF << (32 - prefix_len)) & 0xFFFFFFFF
+        networks.append((network & mask, mask))
+    return networks
+
+
+def ip_in_networks(ip: str, networks: List[Tuple[int, int]]) -> bool:
+    """检查IPv4地址是否属于 parse_ipv4_networks 解析出的任一网段"""
+    ip_value = ipv4_to_int(ip)
+    if ip_value < 0:
+        return False
+    for network, mask in networks:
+        if ip_value & mask == network:
+            return True
+    return False
+
+
+def shutdown_executor(executor: Executor):
+    """不等待地关闭线程池并丢弃尚未开始的任务（cancel_futures 需要 Python 3.9+）"""
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        executor.shutdown(wait=False)
+
+
 def is_china_ip(ip: str) -> bool:
     """检查是否为中国IP"""
     try:
@@ -6,14 +6,18 @@ V2Ray DAT文件解析器 - 完整版
 支持protobuf格式的正确解析
 """
 
+import os
+import mmap
+import socket
 import struct
-import ipaddress
 import re
+from contextlib import contextmanager
 from typing import Dict, List, Set, Tuple, Optional
 from dataclasses import dataclass
+from utils import DATACLASS_SLOTS
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class DomainRule:
     """域名规则"""
     rule_type: str  # 'domain', 'full', 'keyword', 'regexp'
@@ -52,47 +56,67 @@ class V2RayDatParser:
             return self.geosite_cache
             
         try:
-            with open(filepath, 'rb') as f:
-                data = f.read()
-            
-            print(f"🔍 解析geosite.dat文件 ({len(data)/1024/1024:.1f}MB)")
-            
-            entries = {}
-            offset = 0
-            
-            while offset < len(data) - 10:  # 留一些缓冲空间
-                try:
-                    # 尝试解析protobuf消息
-                    entry = self._parse_geosite_entry(data, offset)
-                    if entry:
-                        offset = entry[0]  # 新offset
-                        category, domains = entry[1], entry[2]
+            with self._open_dat(filepath) as data:
+                print(f"🔍 解析geosite.dat文件 ({len(data)/1024/1024:.1f}MB)")
+            
+                entries = {}
+                offset = 0
+            
+                while offset < len(data) - 10:  # 留一些缓冲空间
+                    # 消息只能从0x0a标签开始，直接跳到下一个候选位置
+                    if data[offset] != 0x0a:
+                        offset = data.find(b'\x0a', offset)
+                        if offset < 0:
+                            break
+                        continue
+                    
+                    try:
+                        # 尝试解析protobuf消息
+                        entry = self._parse_geosite_entry(data, offset)
+                        if entry:
+                            offset = entry[0]  # 新offset
+                            category, domains = entry[1], entry[2]
                         
-                        if category and domains:
-                            entries[category] = GeositeEntry(
-                                category=category,
-                                domains=domains,
-                                domain_count=len(domains)
-                            )
-                    else:
-                        offset += 1  # 继续搜索
+                            if category and domains:
+                                entries[category] = GeositeEntry(
+                                    category=category,
+                                    domains=domains,
+                                    domain_count=len(domains)
+                                )
+                        else:
+                            offset += 1  # 继续搜索
                         
-                except Exception:
-                    offset += 1  # 解析失败，继续
+                    except Exception:
+                        offset += 1  # 解析失败，继续
                     
-            print(f"✅ 成功解析 {len(entries)} 个分类")
+                print(f"✅ 成功解析 {len(entries)} 个分类")
             
-            # 显示解析统计
-            total_domains = sum(entry.domain_count for entry in entries.values())
-            print(f"📊 总计 {total_domains} 个域名")
+                # 显示解析统计
+                total_domains = sum(entry.domain_count for entry in entries.values())
+                print(f"📊 总计 {total_domains} 个域名")
             
-            self.geosite_cache = entries
-            return entries
+                self.geosite_cache = entries
+                return entries
             
         except Exception as e:
             print(f"❌ 解析geosite.dat失败: {e}")
             return self._get_fallback_geosite_data()
     
+    def clear_cache(self):
+        """释放已解析的数据，下次调用时重新解析"""
+        self.geosite_cache = None
+        self.geoip_cache = None
+    
+    @contextmanager
+    def _open_dat(self, filepath: str):
+        """以只读内存映射打开DAT文件，由内核按需分页读入，避免复制整个文件"""
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b''  # 空文件无法映射
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+    
     def _parse_geosite_entry(self, data: bytes, offset: int) -> Optional[Tuple[int, str, List[str]]]:
         """解析单个geosite条目"""
         try:
@@ -269,6 +293,12 @@ class V2RayDatParser:
     
     def _read_varint(self, data: bytes, offset: int) -> Tuple[Optional[int], int]:
         """读取protobuf变长整数"""
+        # 标签和短长度绝大多数只占一个字节，直接返回
+        if offset < len(data):
+            byte = data[offset]
+            if byte < 0x80:
+                return byte, 1
+        
         result = 0
         shift = 0
         bytes_read = 0
@@ -297,37 +327,42 @@ class V2RayDatParser:
             return self.geoip_cache
             
         try:
-            with open(filepath, 'rb') as f:
-                data = f.read()
-            
-            print(f"🔍 解析geoip.dat文件 ({len(data)/1024/1024:.1f}MB)")
-            
-            entries = {}
-            offset = 0
-            
-            while offset < len(data) - 10:
-                try:
-                    entry = self._parse_geoip_entry(data, offset)
-                    if entry:
-                        offset = entry[0]
-                        country_code, ip_ranges = entry[1], entry[2]
+            with self._open_dat(filepath) as data:
+                print(f"🔍 解析geoip.dat文件 ({len(data)/1024/1024:.1f}MB)")
+            
+                entries = {}
+                offset = 0
+            
+                while offset < len(data) - 10:
+                    # 消息只能从0x0a标签开始，直接跳到下一个候选位置
+                    if data[offset] != 0x0a:
+                        offset = data.find(b'\x0a', offset)
+                        if offset < 0:
+                            break
+                        continue
+                    
+                    try:
+                        entry = self._parse_geoip_entry(data, offset)
+                        if entry:
+                            offset = entry[0]
+                            country_code, ip_ranges = entry[1], entry[2]
                         
-                        if country_code and ip_ranges:
-                            entries[country_code] = GeoipEntry(
-                                country_code=country_code,
-                                ip_ranges=ip_ranges,
-                                total_ips=sum(2**(32-prefix) for _, prefix in ip_ranges)
-                            )
-                    else:
-                        offset += 1
+                            if country_code and ip_ranges:
+                                entries[country_code] = GeoipEntry(
+                                    country_code=country_code,
+                                    ip_ranges=ip_ranges,
+                                    total_ips=sum(2**(32-prefix) for _, prefix in ip_ranges)
+                                )
+                        else:
+                            offset += 1
                         
-                except Exception:
-                    offset += 1
+                    except Exception:
+                        offset += 1
                     
-            print(f"✅ 成功解析 {len(entries)} 个国家/地区")
+                print(f"✅ 成功解析 {len(entries)} 个国家/地区")
             
-            self.geoip_cache = entries
-            return entries
+                self.geoip_cache = entries
+                return entries
             
         except Exception as e:
             print(f"❌ 解析geoip.dat失败: {e}")
@@ -439,8 +474,7 @@ class V2RayDatParser:
                     # 读取IP数据
                     if offset + length > len(range_data) or length != 4:
                         break
-                    ip_bytes = range_data[offset:offset + length]
-                    ip_addr = ipaddress.IPv4Address(ip_bytes)
+                    ip_addr = socket.inet_ntoa(range_data[offset:offset + length])
                     offset += length
                     
                 elif field_num == 2 and wire_type == 0:  # 前缀字段 (varint)
@@ -454,7 +488,7 @@ class V2RayDatParser:
                     offset += 1
             
             if ip_addr is not None and prefix_len is not None and 0 <= prefix_len <= 32:
-                return (str(ip_addr), prefix_len)
+                return (ip_addr, prefix_len)
                     
         except Exception:
             pass